@@ -1,13 +1,9 @@
 #!/usr/bin/env python3.6
 # -*- coding: utf-8 -*-
 
-from qiskit import QuantumRegister, ClassicalRegister
-
-from qchannels.core.theory import fidelity, create_choi_matrix_from_channel
+from qchannels.core.theory import fidelity, get_theory_choi_matrix
 from qchannels.core.manage_parameters import set_parameters
-from qchannels.core.launcher import Launcher
-from qchannels.channels import IdentityCircuit, QutritSuperpositionCircuit
-from qchannels.core.tools import SIMULATORS, BACKENDS
+from qchannels.core.tools import SIMULATORS, CHOI, get_backend
 
 import numpy as np
 
@@ -16,6 +12,13 @@ parameters = set_parameters(
     'Calculate Choi Matrix by direct method',
 )
 
+# qiskit is imported by the next modules, it's done after parsing of arguments,
+# so --help doesn't wait for it
+from qiskit import QuantumRegister, ClassicalRegister
+
+from qchannels.core.launcher import Launcher
+from qchannels.channels import IdentityCircuit, QutritSuperpositionCircuit
+
 if parameters['backend_name'] in SIMULATORS:
     # Increase speed on simulation
     identity_mask = {0: 0, 1: 1}
@@ -24,7 +27,7 @@ if parameters['backend_name'] in SIMULATORS:
 else:
     identity_mask = {0: 6, 1: 7}
     channel_mask = {3: 11, 0: 12, 2: 16, 1: 17}
-    backend = next(filter(lambda backend: backend.name() == parameters['backend_name'], BACKENDS))
+    backend = get_backend(parameters['backend_name'])
     num_qubits = backend.configuration().n_qubits
 
 channel_class = parameters['channel_class']
@@ -45,7 +48,9 @@ preparation_circuit.cnot(preparation_circuit.rel_qr[0], identity_channel.rel_qr[
 preparation_circuit.cnot(preparation_circuit.rel_qr[1], identity_channel.rel_qr[1])
 circuit = preparation_circuit + test_channel + identity_channel
 
-launcher = Launcher(parameters['token'], parameters['backend_name'], parameters['shots'])
+launcher = Launcher(parameters['token'], parameters['backend_name'], parameters['shots'],
+                    cache=parameters['cache'], exact=parameters['exact'],
+                    store=parameters['store'])
 choi = launcher.run(circuit, meas_qubits=identity_channel.system_qubits +
                                          test_channel.system_qubits)[0]
 
@@ -54,5 +59,9 @@ choi = np.delete(choi, [3, 7, 11, 15, 12, 13, 14], 1)
 choi = choi / np.trace(choi)
 
 print(f"choi matrix: {choi}")
+if parameters['store'] is not None:
+    parameters['store'].append(CHOI, choi, channel=channel_class.__name__, mask=channel_mask,
+                               backend=parameters['backend_name'], shots=parameters['shots'],
+                               exact=parameters['exact'])
 print(f"fidelity between theoretical expectation and the experiment "
-      f"{fidelity(choi, create_choi_matrix_from_channel(channel_class.get_theory_channel()))}")
+      f"{fidelity(choi, get_theory_choi_matrix(channel_class))}")
@@ -3,21 +3,24 @@
 
 import numpy as np
 
-from qchannels.core.launcher import Launcher
 from qchannels.core.manage_parameters import set_parameters
-from qchannels.core.theory import get_matrix_from_tomography_to_eij, get_qutrit_density_matrix_basis
-from qchannels.core.theory import fidelity, create_choi_matrix_from_channel
-from qchannels.core.tools import SIMULATORS, BACKENDS
-
-from basis import preparation_full_set_of_qutrit_density_matrices
+from qchannels.core.theory import create_choi_matrix_from_tomography, get_qutrit_density_matrix_basis
+from qchannels.core.theory import fidelity, fidelities, get_theory_choi_matrix
+from qchannels.core.tools import SIMULATORS, CHOI, get_backend
 
 parameters = set_parameters('Calculate Choi Matrix and fidelity between experiment '
                             'and theory prediction')
 
+# qiskit is imported by the next modules, it's done after parsing of arguments,
+# so --help doesn't wait for it
+from qchannels.core.launcher import Launcher
+
+from basis import preparation_full_set_of_qutrit_density_matrices
+
 if parameters['backend_name'] in SIMULATORS:
     channel_mask = {}
 else:
-    backend = next(filter(lambda backend: backend.name() == parameters['backend_name'], BACKENDS))
+    backend = get_backend(parameters['backend_name'])
     num_qubits = backend.configuration().n_qubits
 
     if num_qubits > 17:
@@ -34,24 +37,25 @@ for circuit in preparation_full_set_of_qutrit_density_matrices(channel.rel_qr):
     circuit.name = channel_class.__name__.lower() + '_' + circuit.name
     circuits.append(circuit)
 
-launcher = Launcher(parameters['token'], parameters['backend_name'], parameters['shots'])
+launcher = Launcher(parameters['token'], parameters['backend_name'], parameters['shots'],
+                    cache=parameters['cache'], exact=parameters['exact'],
+                    store=parameters['store'])
 matrices = launcher.run(circuits, channel.system_qubits)
 matrices = list(map(lambda rho: rho[:3,:3]/np.trace(rho[:3,:3]), matrices))
 
 print('Fidelity of tomography')
 theory_channel = channel.get_theory_channel()
-for i, rho in enumerate(get_qutrit_density_matrix_basis()):
-    print(f"fidelity: {fidelity(theory_channel(rho), matrices[i])}")
+theory_matrices = [theory_channel(rho) for rho in get_qutrit_density_matrix_basis()]
+for i, value in enumerate(fidelities(np.array(theory_matrices), np.array(matrices))):
+    print(f"fidelity: {value}")
     print(f"trace: {np.trace(matrices[i])}")
 print('=======')
 
-matrices = np.array(matrices)
-tomo_to_eij = get_matrix_from_tomography_to_eij()
-eij_matrices = [[None for i in range(3)] for j in range(3)]
-for i in range(3):
-    for j in range(3):
-        eij_matrices[i][j] = np.tensordot(tomo_to_eij[3*i+j,:], matrices, axes=(0, 0))
-choi_exp = np.block(eij_matrices)/3
+choi_exp = create_choi_matrix_from_tomography(np.array(matrices))
 print(f"choi matrix:\n {choi_exp}")
+if parameters['store'] is not None:
+    parameters['store'].append(CHOI, choi_exp, channel=channel_class.__name__, mask=channel_mask,
+                               backend=parameters['backend_name'], shots=parameters['shots'],
+                               exact=parameters['exact'])
 print(f"Fidelity in comparison to theory expectation: "
-      f"{fidelity(choi_exp, create_choi_matrix_from_channel(theory_channel))}")
+      f"{fidelity(choi_exp, get_theory_choi_matrix(channel_class))}")
@@ -1,12 +1,17 @@
 #!/usr/bin/env python3.6
 # -*- coding: utf-8 -*-
 
-from qchannels.channels.abstract import AbstractChannelCircuit
+import numpy as np
+
 from qchannels.core.manage_parameters import set_parameters
-from qchannels.core.launcher import Launcher
 from qchannels.core.theory import fidelity, get_state, get_density_matrix_from_state
 
-import numpy as np
+parameters = set_parameters('Test Hadamard transformation')
+
+# qiskit is imported by the next modules, it's done after parsing of arguments,
+# so --help doesn't wait for it
+from qchannels.channels.abstract import AbstractChannelCircuit
+from qchannels.core.launcher import Launcher
 
 
 class Hadamard(AbstractChannelCircuit):
@@ -21,12 +26,11 @@ class Hadamard(AbstractChannelCircuit):
         return lambda rho: H@rho@H
 
 
-parameters = set_parameters('Test Hadamard transformation')
-
 mask = {0: 3}  # It's optional. It changes a qubit in channel, more details in AbstractChannelCircuit
 channel = Hadamard(backend_name=parameters['backend_name'], mask=mask)
 launcher = Launcher(token=parameters['token'], backend_name=parameters['backend_name'],
-                    shots=parameters['shots'])
+                    shots=parameters['shots'], cache=parameters['cache'],
+                    exact=parameters['exact'], store=parameters['store'])
 rho = launcher.run(channel, meas_qubits=channel.system_qubits)[0]
 print(fidelity(rho, channel.get_theory_channel()(
     get_density_matrix_from_state(get_state(0, dim=2))
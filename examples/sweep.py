@@ -0,0 +1,37 @@
+#!/usr/bin/env python3.6
+# -*- coding: utf-8 -*-
+
+from qchannels.core.manage_parameters import set_parameters, get_channel_names
+
+parameters = set_parameters(
+    'Run channels with several masks, shots and backends in one process. '
+    'Use --remote to log in to IBMQ for remote backends in --backends',
+    additional_argument_list=[
+        (['--channels'], {'nargs': '+', 'choices': get_channel_names(),
+                          'default': ['Landau-Streater', 'Werner-Holevo'],
+                          'help': 'Names of channels (default: %(default)s)'}),
+        (['--backends'], {'nargs': '+', 'default': None,
+                          'help': 'Names of backends (default: --backend)'}),
+        (['--shots-list'], {'nargs': '+', 'type': int, 'default': None,
+                            'help': 'Numbers of shots (default: --shots)'}),
+    ]
+)
+args = parameters['args']
+
+# qiskit is imported by the next modules, it's done after parsing of arguments,
+# so --help doesn't wait for it
+from qchannels.core.sweep import Sweep
+
+masks = [{}, {0: 4, 1: 3, 2: 2, 3: 1}]
+sweep = Sweep(args.channels, masks=masks,
+              shots=args.shots_list or [parameters['shots']],
+              backend_names=args.backends or [parameters['backend_name']],
+              token=parameters['token'], cache=parameters['cache'], exact=parameters['exact'],
+              store=parameters['store'], deduplicate=True)
+records = sweep.run()
+
+print(f"{'channel':<30}{'mask':<35}{'shots':>7}  {'backend':<25}{'fidelity':>10}")
+for record in records:
+    fidelity = '-' if record['fidelity'] is None else f"{record['fidelity']:.5f}"
+    print(f"{record['channel']:<30}{str(record['mask']):<35}{record['shots']:>7}  "
+          f"{record['backend']:<25}{fidelity:>10}")
@@ -1,4 +1,6 @@
 from .landau_streater import *
 from .werner_holevo import *
 from .identity import *
+from .bit_flip import *
 from .qutrit_superposition import *
+from .composite import CompositeChannel
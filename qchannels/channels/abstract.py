@@ -1,9 +1,16 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, BasicAer
+import numpy as np
+
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from qiskit.circuit import Parameter
 from qiskit.circuit.register import Register
 
-from qchannels.core.tools import LOCAL_SIMULATOR, BACKENDS, IBMQ_SIMULATOR
+from qchannels.core.tools import LOCAL_SIMULATOR, LOCAL_BACKENDS, IBMQ_SIMULATOR, get_backend
+from qchannels.core.tools import get_coupling_graph, get_backend_coupling_graph, circuit_hash
+from qchannels.core.simulator import choi_matrix
+from qchannels.channels.composite import CompositeChannel
 
 
 class MaskRegister:
@@ -30,10 +37,20 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
 
     REL_SYSTEM_QUBITS = []
     REL_ENV_QUBITS = []
+    THEORY_DIM = None  # dimension of the theory channel (default: 2**len(system_qubits))
+    PARAMETERS = {}  # name -> default value, see channel_parameters
+
+    USE_TEMPLATES = True  # False if create_circuit() depends on anything besides _template_key()
+
+    MAX_CHOI_MATRICES = 32  # the number of Choi matrices memoized by to_choi()
+
+    _choi_matrices = OrderedDict()  # memoized results of to_choi(), the least recent first
+    _templates = {}  # gates recorded by create_circuit(), see build_circuit()
 
     @staticmethod
-    def get_theory_channel():
+    def get_theory_channel(**parameters):
         """
+        :param parameters: values of PARAMETERS
         :return: function
         """
         raise NotImplementedError
@@ -48,9 +65,9 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
         pass
 
     def cnot(self, a, b):
-        if self.coupling_map is None or [a[1], b[1]] in self.coupling_map:
+        if self.coupling_graph is None or self.coupling_graph.has_edge(a[1], b[1]):
             self.cx(a, b)
-        elif [b[1], a[1]] in self.coupling_map:
+        elif self.coupling_graph.has_edge(b[1], a[1]):
             self.h(a)
             self.h(b)
             self.cx(b, a)
@@ -61,7 +78,7 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
 
     def __init__(self, name=None, q_reg=None, c_reg=None, mask=None,
                  backend_name=LOCAL_SIMULATOR, num_qubits=None,
-                 rel_system_qubits=None, env_qubits=None, coupling_map=None):
+                 rel_system_qubits=None, env_qubits=None, coupling_map=None, parameters=None):
         """
         :param mask: dict. Circuit for the channel can be defined for first qubits and
         changing a mask you can move channel on specific qubits. In the mask,
@@ -72,13 +89,26 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
         then first qubit is control and second qubit is a target.
         :param backend_name: str. There is necessary for circuit that depend on topology of backend.
         :param coupling_map: backend.configuration()['coupling_map'] (default: 'all-to-all')
+        :param parameters: dict, name of PARAMETERS -> number or qiskit Parameter.
+        The rest of PARAMETERS have default values. Values are in self.channel_parameters,
+        create_circuit() takes them from there. Parameters are bound by bind_parameters()
+        or by Launcher.run(parameter_binds=...).
         """
-        backend = next(filter(lambda backend: backend.name() == backend_name, BACKENDS))
+        backend = get_backend(backend_name)
 
-        self.coupling_map = getattr(backend.configuration(), 'coupling_map', None) \
-            if coupling_map is None else coupling_map
+        if coupling_map is None:
+            self.coupling_graph = get_backend_coupling_graph(backend_name)
+            self.coupling_map = getattr(backend.configuration(), 'coupling_map', None) \
+                if self.coupling_graph is not None else None
+        else:
+            self.coupling_graph = get_coupling_graph(coupling_map)
+            self.coupling_map = coupling_map
         self.backend = backend
         self.mask = mask if mask is not None else {}
+        self.channel_parameters = {**self.PARAMETERS, **(parameters or {})}
+        if self.channel_parameters.keys() != self.PARAMETERS.keys():
+            raise ValueError(f"Unknown parameters "
+                             f"{set(self.channel_parameters) - set(self.PARAMETERS)}")
         self.rel_system_qubits = rel_system_qubits if rel_system_qubits is not None else self.REL_SYSTEM_QUBITS
         self.rel_env_qubits = env_qubits if env_qubits is not None else self.REL_ENV_QUBITS
         self.system_qubits = list(map(lambda x: self.mask.get(x, x), self.rel_system_qubits))
@@ -91,7 +121,7 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
                 self.num_qubits = q_reg.size
             elif isinstance(q_reg, MaskRegister):
                 self.num_qubits = q_reg.reg.size
-        elif self.backend not in BasicAer.backends() and self.backend.name() != IBMQ_SIMULATOR:
+        elif self.backend.name() not in [*LOCAL_BACKENDS, IBMQ_SIMULATOR]:
             self.num_qubits = self.backend.configuration().n_qubits
         else:
             self.num_qubits = max([*self.system_qubits, *self.env_qubits]) + 1
@@ -103,7 +133,53 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
 
         super().__init__(self.qr, name=name)
 
+        self.build_circuit()
+
+    def _template_key(self):
+        return (
+            type(self), tuple(sorted(self.mask.items())),
+            None if self.coupling_graph is None else self.coupling_graph.edges,
+            tuple(self.rel_system_qubits), tuple(self.rel_env_qubits),
+            tuple(sorted(self.channel_parameters.items(), key=lambda item: item[0]))
+        )
+
+    def bind_parameters(self, value_dict):
+        """
+        :param value_dict: dict, qiskit Parameter -> number
+        :return: a copy of the channel, channel_parameters are bound too
+        (so get_theory_channel(**channel_parameters) is the theory of the copy)
+        """
+        circuit = super().bind_parameters(value_dict)
+        circuit.channel_parameters = {name: value_dict.get(value, value)
+                                      for name, value in self.channel_parameters.items()}
+        return circuit
+
+    def build_circuit(self):
+        """
+        Gates of create_circuit() are recorded once per class, mask, coupling map and relative
+        qubits as a template: instructions and indexes of qubits. Next instances with the same key
+        get the instructions without calling create_circuit(), they are shared between instances
+        (as in QuantumCircuit.extend()). Circuits with parameters or with gates on other registers
+        aren't recorded.
+        """
+        key = self._template_key() if self.USE_TEMPLATES else None
+        template = self._templates.get(key)
+        if template is not None:
+            self.data.extend((instruction, [(self.qr, index) for index in qargs], [])
+                             for instruction, qargs in template)
+            return
+
         self.create_circuit(self.rel_qr)
+        if key is not None and self._is_template():
+            self._templates[key] = [(instruction, [index for _, index in qargs])
+                                    for instruction, qargs, _ in self.data]
+
+    def _is_template(self):
+        return all(
+            not cargs and all(reg is self.qr for reg, _ in qargs) and
+            not any(isinstance(param, Parameter) for param in instruction.params)
+            for instruction, qargs, cargs in self.data
+        )
 
     def set_regs(self, q_reg):
         if q_reg is None:
@@ -113,6 +189,26 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
 
         self.rel_qr = MaskRegister(self.qr, mask=self.mask)
 
+    def to_choi(self, dim=None):
+        """
+        Choi matrix of the channel calculated from gates of the circuit without execution.
+        Environment qubits start from |0> and are traced out. The convention is the same as
+        in create_choi_matrix_from_channel(), so it can be compared with the theory channel.
+        Last MAX_CHOI_MATRICES results are memoized by the template key and circuit_hash() of
+        the circuit, so gates added to the circuit after create_circuit() give another Choi matrix.
+        :param dim: int, the channel acts on first dim states of system qubits
+        (default: 2**len(system_qubits)), e.g. 3 for qutrit channels
+        :return: np.array(dim**2, dim**2)
+        """
+        key = (*self._template_key(), circuit_hash(self), dim)
+        if key in self._choi_matrices:
+            self._choi_matrices.move_to_end(key)
+        else:
+            self._choi_matrices[key] = choi_matrix(self, self.system_qubits, dim)
+            while len(self._choi_matrices) > self.MAX_CHOI_MATRICES:
+                self._choi_matrices.popitem(last=False)
+        return np.copy(self._choi_matrices[key])
+
     # TODO rename
     def mask_to_real(self, x):
         return self.mask.get(x, x)
@@ -125,21 +221,24 @@ class AbstractChannelCircuit(ABC, QuantumCircuit):
         else:
             return x
 
+    @property
+    def theory_dim(self):
+        return self.THEORY_DIM if self.THEORY_DIM is not None else 2**len(self.system_qubits)
+
     # TODO implement add, create new class for addition
 
     def __call__(self, channel):
         """
-        TODO
-
-        F1(F2(rho))
-        :param channel: AbstractChannelCircuit
+        F1(F2(rho)). The result is lazy, see CompositeChannel
+        :param channel: AbstractChannelCircuit or CompositeChannel
+        :return: CompositeChannel
         """
-        raise NotImplementedError
+        return CompositeChannel(CompositeChannel.COMPOSITION, [self, channel])
 
     def __mul__(self, other):
         """
-        TODO
-
-        Tensor product
+        Tensor product. The result is lazy, see CompositeChannel
+        :param other: AbstractChannelCircuit or CompositeChannel
+        :return: CompositeChannel
         """
-        raise NotImplementedError
+        return CompositeChannel(CompositeChannel.TENSOR_PRODUCT, [self, other])
@@ -0,0 +1,41 @@
+from math import pi, sin
+
+import numpy as np
+
+from qchannels.channels.abstract import AbstractChannelCircuit
+from qchannels.core.theory import batched_channel
+
+X = np.array([[0, 1], [1, 0]])
+
+
+def theory_bit_flip(theta=pi/2):
+    """
+    :param theta: float, X is applied with probability sin(theta/2)**2
+    :return: batched function
+    """
+    probability = sin(theta/2)**2
+
+    @batched_channel
+    def _channel(rho):
+        return (1 - probability)*rho + probability*X@rho@X
+    return _channel
+
+
+class BitFlipCircuit(AbstractChannelCircuit):
+    """
+    Family of bit flip channels. The environment qubit is rotated by theta, then it flips
+    the system qubit by CNOT. theta can be a qiskit Parameter, e.g.
+    BitFlipCircuit(parameters={'theta': Parameter('theta')}).
+    """
+    REL_SYSTEM_QUBITS = [0]
+    REL_ENV_QUBITS = [1]
+    THEORY_DIM = 2
+    PARAMETERS = {'theta': pi/2}
+
+    @staticmethod
+    def get_theory_channel(theta=pi/2):
+        return theory_bit_flip(theta)
+
+    def create_circuit(self, q_regs):
+        self.u3(self.channel_parameters['theta'], 0, 0, q_regs[1])
+        self.cnot(q_regs[1], q_regs[0])
@@ -0,0 +1,178 @@
+from functools import reduce
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+from qchannels.core.theory import batched_channel, create_channel_from_choi_matrix
+from qchannels.core.theory import create_channel_from_superoperator, get_theory_choi_matrix
+
+
+class CompositeChannel:
+    """
+    Lazy composition F1(F2) or tensor product F1 * F2 of channels (AbstractChannelCircuit or
+    CompositeChannel). The expression tree is kept, circuits are concatenated only in
+    to_circuit() (Launcher calls it). The theory channel is evaluated by products of
+    superoperators (composition) and by application of every factor to its subsystem
+    (tensor product), so the Choi matrix of the whole composite is never built.
+    All channels have to be created on the same quantum register (see q_reg of
+    AbstractChannelCircuit). system_qubits of a tensor product are ordered as
+    the theory channel expects (kron) if theory_dim of factors is 2**len(system_qubits).
+    """
+    COMPOSITION = 'composition'
+    TENSOR_PRODUCT = 'tensor_product'
+
+    def __init__(self, operation, channels):
+        """
+        :param operation: COMPOSITION or TENSOR_PRODUCT
+        :param channels: list. COMPOSITION: channels[0](channels[1](...)), i.e. the last channel
+        is applied first. TENSOR_PRODUCT: the theory channel acts on kron(rho_0, rho_1, ...)
+        """
+        if operation not in [self.COMPOSITION, self.TENSOR_PRODUCT]:
+            raise ValueError(f"Unknown operation {operation}")
+        self.operation = operation
+        self.channels = []
+        for channel in channels:
+            # (F1(F2))(F3) = F1(F2(F3)), (F1 * F2) * F3 = F1 * F2 * F3
+            if isinstance(channel, CompositeChannel) and channel.operation == operation:
+                self.channels.extend(channel.channels)
+            else:
+                self.channels.append(channel)
+
+        if len({channel.qr for channel in self.channels}) != 1:
+            raise ValueError("Channels have to be created on the same quantum register")
+        self.qr = self.channels[0].qr
+
+        if operation == self.COMPOSITION:
+            self._check_composition()
+            self.system_qubits = list(self.channels[0].system_qubits)
+            self.theory_dim = self.channels[0].theory_dim
+        else:
+            self._check_tensor_product()
+            # kron(rho_0, rho_1, ...): the first channel is the most significant
+            self.system_qubits = [qubit for channel in reversed(self.channels)
+                                  for qubit in channel.system_qubits]
+            self.theory_dim = int(np.prod([channel.theory_dim for channel in self.channels]))
+        self.env_qubits = sorted({qubit for channel in self.channels
+                                  for qubit in channel.env_qubits})
+
+    def _check_composition(self):
+        system_qubits = self.channels[0].system_qubits
+        used_qubits = set(system_qubits)
+        # The first applied channel is the last one
+        for channel in reversed(self.channels):
+            if list(channel.system_qubits) != list(system_qubits) or \
+                    channel.theory_dim != self.channels[0].theory_dim:
+                raise ValueError("Composed channels have to act on the same system qubits")
+            if used_qubits & set(channel.env_qubits):
+                raise ValueError("Environment qubits of a channel have to be fresh (|0>), "
+                                 "they can't be used by previous channels")
+            used_qubits |= set(channel.env_qubits)
+
+    def _check_tensor_product(self):
+        qubits = [qubit for channel in self.channels
+                  for qubit in [*channel.system_qubits, *channel.env_qubits]]
+        if len(qubits) != len(set(qubits)):
+            raise ValueError("Channels in a tensor product have to act on different qubits")
+
+    def __call__(self, channel):
+        """
+        Composition self(channel(rho))
+        :param channel: AbstractChannelCircuit or CompositeChannel
+        """
+        return CompositeChannel(CompositeChannel.COMPOSITION, [self, channel])
+
+    def __mul__(self, other):
+        """
+        Tensor product
+        """
+        return CompositeChannel(CompositeChannel.TENSOR_PRODUCT, [self, other])
+
+    def leaves(self):
+        """
+        :return: list of channels in order of application
+        """
+        channels = reversed(self.channels) if self.operation == self.COMPOSITION else self.channels
+        return [leaf for channel in channels
+                for leaf in (channel.leaves() if isinstance(channel, CompositeChannel)
+                             else [channel])]
+
+    def to_circuit(self, name=None):
+        """
+        :return: QuantumCircuit, concatenated circuits of channels
+        """
+        circuit = QuantumCircuit(self.qr, name=name)
+        for channel in self.leaves():
+            circuit.extend(channel)
+        return circuit
+
+    def get_theory_channel(self):
+        """
+        :return: function, it can be applied to a stack of density matrices
+        """
+        channels = [get_fused_theory_channel(channel) for channel in self.channels]
+        if self.operation == self.COMPOSITION:
+            return compose_channels(channels)
+        return tensor_product_of_channels(channels, [channel.theory_dim
+                                                     for channel in self.channels])
+
+
+def get_fused_theory_channel(channel):
+    """
+    :param channel: AbstractChannelCircuit or CompositeChannel
+    :return: batched function, the theory channel of AbstractChannelCircuit is applied
+    by its superoperator
+    """
+    if isinstance(channel, CompositeChannel):
+        return channel.get_theory_channel()
+    return create_channel_from_choi_matrix(get_theory_choi_matrix(
+        type(channel), channel.theory_dim, **channel.channel_parameters
+    ))
+
+
+def compose_channels(channels):
+    """
+    :param channels: list of batched functions, the last one is applied first.
+    Adjacent functions with superoperator attribute are multiplied into one superoperator.
+    :return: batched function
+    """
+    fused = []
+    for channel in channels:
+        if fused and hasattr(fused[-1], 'superoperator') and hasattr(channel, 'superoperator'):
+            fused[-1] = create_channel_from_superoperator(
+                fused[-1].superoperator @ channel.superoperator
+            )
+        else:
+            fused.append(channel)
+
+    if len(fused) == 1:
+        return fused[0]
+
+    @batched_channel
+    def _channel(rho):
+        return reduce(lambda result, channel: channel(result), reversed(fused), rho)
+    return _channel
+
+
+def tensor_product_of_channels(channels, dims):
+    """
+    :param channels: list of batched functions
+    :param dims: list of dimensions of subsystems
+    :return: batched function on kron(rho_0, rho_1, ...), every channel is applied
+    to its subsystem only
+    """
+    n = len(dims)
+
+    @batched_channel
+    def _channel(rho):
+        rho = np.asarray(rho)
+        batch_shape = rho.shape[:-2]
+        batch_axes = len(batch_shape)
+        rho = rho.reshape(*batch_shape, *dims, *dims)
+        for k, channel in enumerate(channels):
+            # Axes of the subsystem are moved to the end, the rest axes are a batch
+            axes = [batch_axes + k, batch_axes + n + k]
+            rho = np.moveaxis(rho, axes, [-2, -1])
+            rho = np.moveaxis(channel(rho), [-2, -1], axes)
+        total_dim = int(np.prod(dims))
+        return rho.reshape(*batch_shape, total_dim, total_dim)
+    return _channel
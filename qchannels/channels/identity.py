@@ -1,10 +1,11 @@
 from qchannels.channels.abstract import AbstractChannelCircuit
+from qchannels.core.theory import batched_channel
 
 
 class IdentityCircuit(AbstractChannelCircuit):
     @staticmethod
     def get_theory_channel():
-        return lambda rho: rho
+        return batched_channel(lambda rho: rho)
 
     def create_circuit(self, q_regs):
         pass
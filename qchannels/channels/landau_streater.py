@@ -4,6 +4,7 @@ import numpy as np
 
 from qchannels.channels.abstract import AbstractChannelCircuit
 from qchannels.core.tools import SIMULATORS
+from qchannels.core.theory import batched_channel
 
 DIM = 3
 Jx = np.array([
@@ -24,6 +25,7 @@ S = np.array([
 ])  # 00 -> -1, 01 -> 0, 10 -> 1
 
 
+@batched_channel
 def theory_landau_streater_channel(rho):
     global Jx, Jy, Jz
     rho = S@rho@S
@@ -33,6 +35,7 @@ def theory_landau_streater_channel(rho):
 class LandauStreaterCircuit(AbstractChannelCircuit):
     REL_SYSTEM_QUBITS = [0, 3]
     REL_ENV_QUBITS = [1, 2]
+    THEORY_DIM = DIM
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -4,17 +4,21 @@ import numpy as np
 
 from qchannels.channels.abstract import AbstractChannelCircuit
 from qchannels.core.tools import SIMULATORS
+from qchannels.core.theory import batched_channel
 
 DIM = 3
 
 
+@batched_channel
 def theory_werner_holevo(rho, dim=DIM):
-    return (np.eye(dim)*np.trace(rho) - np.transpose(rho))/(dim - 1)
+    trace = np.trace(rho, axis1=-2, axis2=-1)[..., None, None]
+    return (np.eye(dim)*trace - np.swapaxes(rho, -1, -2))/(dim - 1)
 
 
 class WernerHolevoCircuit(AbstractChannelCircuit):
     REL_SYSTEM_QUBITS = [0, 3]
     REL_ENV_QUBITS = [1, 2]
+    THEORY_DIM = DIM
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
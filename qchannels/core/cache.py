@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import pickle
+from abc import ABC, abstractmethod
+
+from qchannels.core.tools import circuit_hash
+
+DEFAULT_CACHE_DIR = os.path.join('outputs', 'cache')
+
+
+class DiskCache(ABC):
+    """
+    Persistent key-value storage. Every entry is a file in the directory.
+    Size of the directory is bounded by max_size, least recently used entries are removed
+    first (a modification time of a file is updated on every hit).
+    Children define how values are serialized (see dumps() and loads()).
+    """
+    EXTENSION = ''
+    BINARY = False
+
+    def __init__(self, directory, max_size=100 * 1024**2):
+        """
+        :param directory: str, it will be created if it doesn't exist
+        :param max_size: int, bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*args):
+        """
+        :param args: json serializable objects
+        :return: str, hex digest
+        """
+        return hashlib.sha256(json.dumps(args).encode()).hexdigest()
+
+    @abstractmethod
+    def dumps(self, value):
+        """
+        :return: str or bytes (if BINARY is set), the content of the entry file
+        """
+        pass
+
+    @abstractmethod
+    def loads(self, data):
+        """
+        :raise: ValueError if the entry is broken, it's treated as missed then
+        """
+        pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.EXTENSION)
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb' if self.BINARY else 'r') as f:
+                value = self.loads(f.read())
+        except (OSError, ValueError):
+            return default
+        os.utime(path)
+        return value
+
+    def get_many(self, keys):
+        """
+        :return: list of values, None for missed keys
+        """
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """
+        :param items: dict
+        """
+        for key, value in items.items():
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb' if self.BINARY else 'w') as f:
+                f.write(self.dumps(value))
+            os.replace(tmp_path, path)  # readers never see partially written entries
+        if items:
+            self.evict()
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry.path)
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(self.EXTENSION)]
+
+    def evict(self):
+        """
+        Remove least recently used entries while the directory is bigger than max_size
+        """
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                   for entry in self._entries()]
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            os.remove(path)
+            size -= entry_size
+
+
+class ResultCache(DiskCache):
+    """
+    Content-addressed cache of counts. A key is the hash of tomography circuit,
+    the backend name, the number of shots and the seed of simulator.
+    """
+    EXTENSION = '.json'
+
+    def __init__(self, directory=os.path.join(DEFAULT_CACHE_DIR, 'results'), *args, **kwargs):
+        super().__init__(directory, *args, **kwargs)
+
+    @classmethod
+    def key(cls, circuit, backend_name, shots, seed=None):
+        """
+        :param circuit: QuantumCircuit or str, its circuit_hash()
+        :return: str
+        """
+        if not isinstance(circuit, str):
+            circuit = circuit_hash(circuit)
+        return cls.make_key(circuit, backend_name, shots, seed)
+
+    def dumps(self, value):
+        return json.dumps(value)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class TranspileCache(DiskCache):
+    """
+    Cache of transpiled circuits (pickled QuantumCircuit). A key is the hash of the circuit,
+    the fingerprint of the backend configuration (name, version, number of qubits,
+    coupling map, basis gates and the version of qiskit) and the optimization level.
+    If the configuration changes, old entries aren't hit anymore and they're evicted as
+    least recently used ones. From optimization level 2 the layout depends on calibrations,
+    so the date of the last update of backend.properties() is in the fingerprint too,
+    lower levels don't depend on calibrations.
+    Entries that can't be unpickled (e.g. after an update of qiskit) are treated as missed.
+    Parameters of unpickled circuits are new objects, Launcher binds them by names,
+    so circuits with several parameters of the same name aren't cached.
+    """
+    EXTENSION = '.pickle'
+    BINARY = True
+
+    def __init__(self, directory=os.path.join(DEFAULT_CACHE_DIR, 'transpiled'), *args, **kwargs):
+        super().__init__(directory, *args, **kwargs)
+
+    @staticmethod
+    def configuration_fingerprint(backend, optimization_level=None):
+        """
+        :param backend: BaseBackend
+        :param optimization_level: int or None, see qiskit.compiler.transpile()
+        :return: list, json serializable
+        """
+        from qiskit import __version__
+
+        configuration = backend.configuration()
+        coupling_map = getattr(configuration, 'coupling_map', None)
+        fingerprint = [
+            backend.name(), getattr(configuration, 'backend_version', None),
+            getattr(configuration, 'n_qubits', None),
+            None if coupling_map is None else sorted(map(list, coupling_map)),
+            sorted(getattr(configuration, 'basis_gates', None) or []),
+            __version__
+        ]
+        if optimization_level is not None and optimization_level >= 2:
+            properties = backend.properties()
+            fingerprint.append(None if properties is None
+                               else str(properties.last_update_date))
+        return fingerprint
+
+    @classmethod
+    def key(cls, circuit, fingerprint, optimization_level=None):
+        """
+        :param circuit: QuantumCircuit or str, its circuit_hash()
+        :param fingerprint: configuration_fingerprint() of the backend
+        :return: str
+        """
+        if not isinstance(circuit, str):
+            circuit = circuit_hash(circuit)
+        return cls.make_key(circuit, fingerprint, optimization_level)
+
+    def dumps(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        try:
+            return pickle.loads(data)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError) as e:
+            raise ValueError(f"Broken entry: {e}")
@@ -0,0 +1,146 @@
+from functools import lru_cache
+from itertools import product
+import numpy as np
+
+from qiskit import QuantumCircuit, ClassicalRegister
+from qiskit.ignis.verification.tomography import StateTomographyFitter
+
+
+class CountsResult:
+    """
+    Minimal replacement of qiskit Result for tomography fitters. It keeps only counts
+    of experiments, so it's cheap to send it to another process.
+    """
+    def __init__(self, counts):
+        """
+        :param counts: dict. A key is name of experiment, a value is its counts
+        """
+        self.counts = counts
+
+    def get_counts(self, experiment):
+        """
+        :param experiment: str or QuantumCircuit
+        """
+        return self.counts[getattr(experiment, 'name', experiment)]
+
+
+def fit_tomography_counts(labels, counts, num_cregs=1):
+    """
+    Fit density matrix by StateTomographyFitter from counts of tomography circuits.
+    It's module-level function, so it can be executed in a process pool.
+    :param labels: list of str, names of tomography circuits, e.g. "('X', 'Y')"
+    :param counts: list of dict, counts of tomography circuits in the same order
+    :param num_cregs: int, number of classical registers in tomography circuits.
+    StateTomographyFitter marginalizes counts if there is more than one register.
+    :return: np.array
+    """
+    # StateTomographyFitter looks only at names and classical registers of circuits
+    circuits = [QuantumCircuit(*[ClassicalRegister(1) for _ in range(num_cregs)], name=label)
+                for label in labels]
+    return StateTomographyFitter(CountsResult(dict(zip(labels, counts))), circuits).fit()
+
+
+PAULI_BASES = ('X', 'Y', 'Z')
+PAULI_MATRICES = {
+    'X': np.array([[0, 1], [1, 0]], dtype=complex),
+    'Y': np.array([[0, -1j], [1j, 0]], dtype=complex),
+    'Z': np.array([[1, 0], [0, -1]], dtype=complex),
+}
+
+
+@lru_cache(maxsize=None)
+def get_pauli_tomography_matrices(num_qubits):
+    """
+    Matrix A of Pauli tomography: probabilities of all outcomes are A @ rho.reshape(-1).
+    Rows are ordered by labels (in order of state_tomography_circuits) and then by outcomes.
+    Bit j of an outcome and j-th element of a label correspond to j-th measured qubit
+    (qiskit little-endian order).
+    :return: (list of str labels, A: np.array(3**n * 2**n, 4**n), pseudo-inverse of A)
+    """
+    # projectors[basis][outcome] = (I + (-1)**outcome * sigma_basis)/2
+    projectors = {basis: [(np.eye(2) + sign*PAULI_MATRICES[basis])/2 for sign in [1, -1]]
+                  for basis in PAULI_BASES}
+
+    labels = list(product(PAULI_BASES, repeat=num_qubits))
+    rows = []
+    for label in labels:
+        for outcome in range(2**num_qubits):
+            projector = np.eye(1)
+            for j, basis in enumerate(label):
+                projector = np.kron(projectors[basis][(outcome >> j) & 1], projector)
+            # Tr(P rho) = sum(P.T * rho), P is hermitian
+            rows.append(np.conj(projector).reshape(-1))
+    measurement_matrix = np.array(rows)
+    return [str(label) for label in labels], measurement_matrix, np.linalg.pinv(measurement_matrix)
+
+
+def project_to_simplex(values):
+    """
+    Euclidean projection of vectors to the probability simplex (vectorized over first axes).
+    :param values: np.array(..., n)
+    :return: np.array(..., n), non-negative and summed to 1 along the last axis
+    """
+    n = values.shape[-1]
+    sorted_values = -np.sort(-values, axis=-1)
+    cumsum = np.cumsum(sorted_values, axis=-1) - 1
+    positive = sorted_values - cumsum / np.arange(1, n + 1) > 0
+    last_positive = n - 1 - np.argmax(positive[..., ::-1], axis=-1)
+    shift = np.take_along_axis(cumsum, last_positive[..., None], axis=-1) / \
+        (last_positive[..., None] + 1)
+    return np.maximum(values - shift, 0)
+
+
+def project_to_density_matrices(rho):
+    """
+    The nearest (in Frobenius norm) density matrices. Eigenvalues are clipped by projection
+    to the probability simplex, see J Smolin, JM Gambetta, G Smith, Phys. Rev. Lett. 108, 070502
+    :param rho: np.array(..., d, d), hermitian matrices
+    :return: np.array(..., d, d)
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(rho)
+    eigenvalues = project_to_simplex(eigenvalues)
+    return (eigenvectors * eigenvalues[..., None, :]) @ np.conj(np.swapaxes(eigenvectors, -1, -2))
+
+
+class LinearInversionFitter:
+    """
+    Batched linear inversion for Pauli state tomography.
+    All density matrices are reconstructed by one matrix product with the pseudo-inverse
+    of the measurement matrix, which is computed once per number of qubits.
+    """
+    def __init__(self, num_qubits):
+        self.num_qubits = num_qubits
+        self.dim = 2**num_qubits
+        self.labels, _, self.pinv = get_pauli_tomography_matrices(num_qubits)
+        self.label_index = {label: i for i, label in enumerate(self.labels)}
+
+    def counts_to_array(self, labels_groups, counts_groups):
+        """
+        :param labels_groups: list of lists of names of tomography circuits
+        :param counts_groups: list of lists of counts in the same order
+        :return: np.array(len(groups), 3**n, 2**n)
+        """
+        data = np.zeros((len(counts_groups), len(self.labels), self.dim))
+        for i, (labels, counts) in enumerate(zip(labels_groups, counts_groups)):
+            for label, label_counts in zip(labels, counts):
+                row = data[i, self.label_index[label]]
+                for key, value in label_counts.items():
+                    # The tomography register is the first one (the rightmost in the key)
+                    row[int(key.replace(' ', '')[-self.num_qubits:], 2)] += value
+        return data
+
+    def fit(self, data, physical=True):
+        """
+        :param data: np.array(N, 3**n, 2**n) of counts (see counts_to_array)
+        :param physical: bool. Project matrices to the nearest density matrices
+        :return: np.array(N, 2**n, 2**n)
+        """
+        frequencies = data / np.sum(data, axis=-1, keepdims=True)
+        rho = (frequencies.reshape(len(data), -1) @ self.pinv.T).reshape(-1, self.dim, self.dim)
+        rho = (rho + np.conj(np.swapaxes(rho, -1, -2))) / 2
+        if physical:
+            rho = project_to_density_matrices(rho)
+        return rho
+
+    def fit_counts(self, labels_groups, counts_groups, physical=True):
+        return self.fit(self.counts_to_array(labels_groups, counts_groups), physical=physical)
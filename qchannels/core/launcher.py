@@ -1,124 +1,716 @@
-from copy import copy
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from collections import defaultdict, deque
 import numpy as np
-from itertools import product
 
-from qiskit import execute, QuantumCircuit
+from qiskit import QuantumCircuit
+from qiskit.compiler import transpile, assemble
 from qiskit.tools.monitor import job_monitor
-from qiskit.ignis.verification.tomography import StateTomographyFitter
-from qiskit.ignis.verification.tomography import state_tomography_circuits
 
-from qchannels.core.tools import MAX_JOBS_PER_ONE, SIMULATORS, BACKENDS, chunks
+from qchannels.core.fitters import fit_tomography_counts, LinearInversionFitter
+from qchannels.core.tomography import tomography_circuits
+from qchannels.core.simulator import reduced_density_matrix
+from qchannels.core.tools import MAX_JOBS_PER_ONE, RHO, get_backend, chunks, circuit_hash
+from qchannels.core.scheduler import get_backend_limits, pack_experiments, part_indexes
+from qchannels.core.scheduler import merge_counts
+from qchannels.channels.composite import CompositeChannel
+
+QISKIT_FITTER = 'qiskit'
+LINEAR_FITTER = 'linear'
+
+
+def sort_list_and_permutation(a):
+    """
+    There is to sorts qubit. Also, it returns axes of density tensor that restore
+    the original order of qubits (see permute_density_matrix)
+    :param a: list
+    :return: (list, list)
+    """
+    b = sorted(a)
+    length = len(a)
+    axes = [length - 1 - b.index(a[length - 1 - i]) for i in range(length)]
+    return b, axes
+
+
+def permute_density_matrix(rho, axes):
+    """
+    Reorder qubits of density matrix by transposition of its tensor axes.
+    It doesn't build 2**n x 2**n permutation matrices.
+    :param rho: np.array(..., 2**len(axes), 2**len(axes)), a single matrix or a stack of them
+    :param axes: list, see sort_list_and_permutation
+    :return: np.array with the same shape as rho
+    """
+    length = len(axes)
+    batch_shape = rho.shape[:-2]
+    offset = len(batch_shape)
+    tensor = rho.reshape(batch_shape + (2,) * (2 * length))
+    tensor = tensor.transpose(list(range(offset)) +
+                              [offset + axis for axis in axes] +
+                              [offset + length + axis for axis in axes])
+    return tensor.reshape(rho.shape)
 
 
 def sort_list_and_transformation_matrix(a):
     """
-    There is to sorts qubit. Also, it returns S matrix for changed density matrix
+    There is to sorts qubit. Also, it returns S matrix for changed density matrix,
+    i.e. np.linalg.inv(S) @ rho @ S == permute_density_matrix(rho, axes).
+    It's kept for compatibility, use sort_list_and_permutation instead.
     :param a: list
     :return: (list, np.array(2**len(a), 2**len(a)))
     """
-    length = len(a)
-    S = np.eye(2**length, 2**length)
-    b = copy(a)
-    # bubble sort
-    for i in range(length):
-        for j in range(length-i-1):
-            if b[j] > b[j+1]:
-                b[j], b[j+1] = b[j+1], b[j]
-
-                # TODO It's slow. Change it, please
-                step_matrix = np.eye(2**length, 2**length)
-                for digits in product([0, 1], repeat=length):
-                    if digits[j] == digits[j+1]:
-                        continue
-
-                    first_number = sum([bit*2**n for n, bit in enumerate(digits)])
-                    second_number = 0
-                    for n, bit in enumerate(digits):
-                        if n == j:
-                            second_number += bit*2**(j+1)
-                        elif n == j + 1:
-                            second_number += bit*2**j
-                        else:
-                            second_number += bit*2**n
-
-                    step_matrix[first_number, second_number] = 1
-                    step_matrix[second_number, first_number] = 1
-                    step_matrix[first_number, first_number] = 0
-                    step_matrix[second_number, second_number] = 0
-
-                S = step_matrix@S
-    return b, S
+    b, axes = sort_list_and_permutation(a)
+    dim = 2**len(a)
+    indexes = np.arange(dim).reshape([2] * len(a)).transpose(axes).reshape(-1)
+    return b, np.eye(dim, dim)[:, indexes]
+
+
+class ExecutionPlan:
+    """
+    Experiments that have to be executed for a list of jobs. Identical experiments are
+    executed once (if deduplicate is set), experiments found in the cache aren't executed.
+    """
+    def __init__(self, jobs, hashes, owners, shots, keys, counts, tasks):
+        """
+        :param jobs: list of QuantumCircuit, all tomography circuits
+        :param hashes: list of circuit_hash of jobs or None
+        :param owners: list, index of unique experiment for every job
+        :param shots: list, shots for every unique experiment
+        :param keys: list of cache keys for every unique experiment or None
+        :param counts: list of counts for every unique experiment, None if it isn't executed yet
+        :param tasks: list of (shots, list of indexes of unique experiments), one task per job.
+        An experiment can be in several tasks if its shots are split, counts are merged then.
+        """
+        self.jobs = jobs
+        self.hashes = hashes
+        self.owners = owners
+        self.shots = shots
+        self.keys = keys
+        self.counts = counts
+        self.tasks = tasks
+
+    @property
+    def saved_experiments(self):
+        """The number of experiments that aren't executed because of duplicates"""
+        return len(self.owners) - len(self.counts)
+
+    @property
+    def representatives(self):
+        """Index of the first job of every unique experiment"""
+        first_jobs = {}
+        for i, owner in enumerate(self.owners):
+            first_jobs.setdefault(owner, i)
+        return [first_jobs[experiment] for experiment in range(len(self.counts))]
+
+    @property
+    def parts(self):
+        """Index of the part of split shots for every task, see part_indexes()"""
+        return part_indexes(self.tasks)
+
+    def tasks_jobs(self):
+        """
+        :return: list of lists of QuantumCircuit to execute, one list per task
+        """
+        representatives = self.representatives
+        return [[self.jobs[representatives[experiment]] for experiment in experiments]
+                for _, experiments in self.tasks]
+
+    def collect(self, results, cache=None):
+        """
+        :param results: list of lists of counts for every task
+        :param cache: ResultCache or None, counts of executed experiments are saved there
+        :return: list of counts for every job
+        """
+        executed = defaultdict(list)
+        for (_, experiments), task_counts in zip(self.tasks, results):
+            for experiment, experiment_counts in zip(experiments, task_counts):
+                executed[experiment].append(experiment_counts)
+        for experiment, experiment_counts in executed.items():
+            self.counts[experiment] = merge_counts(*experiment_counts)
+
+        if cache is not None:
+            cache.set_many({self.keys[experiment]: self.counts[experiment]
+                            for experiment in executed})
+        return [self.counts[owner] for owner in self.owners]
 
 
 class Launcher:
     def __init__(self, token=None, backend_name='ibmq_16_melbourne',
-                 shots=8192):
+                 shots=8192, max_concurrent_jobs=1, fit_workers=1, cache=None, seed=None,
+                 fitter=QISKIT_FITTER, deduplicate=False, combine_shots=False,
+                 exact=False, transpile_cache=None, optimization_level=None, store=None):
+        """
+        :param max_concurrent_jobs: int. How many chunks of experiments can be in flight
+        (submitted to the backend and not finished yet) at the same time.
+        By default chunks are executed one by one.
+        :param fit_workers: int. Number of processes for tomography fitting.
+        By default density matrices are fitted one by one in the current process.
+        :param cache: ResultCache or None. Counts of experiments are taken from the cache
+        if they're there and only the rest of experiments are executed.
+        :param seed: int or None, seed of simulator. Parts of an experiment split by max_shots
+        are sampled with seed + index of the part.
+        :param fitter: str. QISKIT_FITTER fits every density matrix by StateTomographyFitter,
+        LINEAR_FITTER reconstructs all of them at once by LinearInversionFitter
+        :param deduplicate: bool. Structurally identical experiments (see circuit_hash) are
+        executed and fitted once, the result is shared between all of them.
+        The number of saved experiments of the last run is in self.saved_experiments
+        :param combine_shots: bool. A deduplicated experiment is executed with the sum of shots
+        of its copies instead of shots
+        :param exact: bool. Density matrices are calculated exactly by StatevectorSimulator
+        without tomography, sampling and fitting. Nothing is sent to the backend.
+        :param transpile_cache: TranspileCache or None. Tomography circuits transpiled for
+        the backend are taken from the cache, only the rest of them are transpiled.
+        :param optimization_level: int or None, see qiskit.compiler.transpile()
+        :param store: ResultStore or None. Density matrices, counts of their tomography
+        experiments and metadata (channel, mask, backend, shots, etc.) are appended to the store.
+        """
         self.shots = shots
         self.token = token
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.fit_workers = fit_workers
+        self.cache = cache
+        self.seed = seed
+        if fitter not in [QISKIT_FITTER, LINEAR_FITTER]:
+            raise ValueError(f"Unknown fitter {fitter}")
+        self.fitter = fitter
+        self.deduplicate = deduplicate
+        self.combine_shots = combine_shots
+        self.exact = exact
+        self.transpile_cache = transpile_cache
+        self.optimization_level = optimization_level
+        self.store = store
+        self.saved_experiments = 0
 
-        self.backend = next(filter(lambda x: x.name() == backend_name, BACKENDS))
+        self.backend = get_backend(backend_name)
 
-        if backend_name in SIMULATORS:
-            self.max_jobs_per_one = 10**6  # approximately infinity :)
-        else:
-            self.max_jobs_per_one = MAX_JOBS_PER_ONE
+        # Experiments are packed into jobs according to limits of the backend
+        self.max_experiments, self.max_shots = get_backend_limits(self.backend)
 
-    def run(self, circuits, meas_qubits=None, measure=None, count_chunks=False):
+    def run(self, circuits, meas_qubits=None, measure=None, count_chunks=False, use_cache=True,
+            parameter_binds=None):
         """
-        :param circuits: list of QuantumCircuit or QuantumCircuit
+        :param circuits: list of QuantumCircuit or QuantumCircuit (CompositeChannel is also allowed)
         :param meas_qubits: list of qubits that will be measured.
         :param measure: optional. By default after channel transformation we do tomography.
         Not implemented now
+        :param count_chunks: bool. Print numbers of chunks and saved experiments
+        :param use_cache: bool. If it's False, all experiments are executed even if their counts
+        are in the cache (e.g. fresh data from real hardware is required). New counts are still
+        saved to the cache.
+        :param parameter_binds: list of dicts {qiskit Parameter: value}. Circuits with parameters
+        (e.g. BitFlipCircuit(parameters={'theta': Parameter('theta')})) are transpiled once,
+        then every bind is applied to transpiled circuits. The result is density matrices of
+        all circuits for the first bind, then for the second one, etc.
         :return: depend on measure parameter. By default, it's list of density matrix
         """
+        if self.exact:
+            return [rho for _, rho in self._run_exact(circuits, meas_qubits, measure,
+                                                      parameter_binds)]
+
+        jobs, sorted_qubits, axes = self._prepare_jobs(circuits, meas_qubits, measure,
+                                                       parameter_binds)
+        plan = self._plan(jobs, use_cache, count_chunks=count_chunks)
+        self.saved_experiments = plan.saved_experiments
+
+        task_jobs = plan.tasks_jobs()
+        task_shots = [shots for shots, _ in plan.tasks]
+        execute_chunk = partial(self._execute_chunk, count_chunks=count_chunks,
+                                transpiled=parameter_binds is not None)
+        if self.max_concurrent_jobs > 1:
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_jobs) as executor:
+                # map keeps the order of submission
+                results = list(executor.map(execute_chunk, range(len(task_jobs)), task_jobs,
+                                            task_shots, plan.parts))
+        else:
+            results = list(map(execute_chunk, range(len(task_jobs)), task_jobs, task_shots,
+                               plan.parts))
+
+        counts = plan.collect(results, self.cache)
+        matrices = self._fit(counts, jobs, sorted_qubits, axes, hashes=plan.hashes)
+        self._save(circuits, meas_qubits, matrices,
+                   self._labels_counts(jobs, counts, len(matrices)),
+                   parameter_binds=parameter_binds)
+        return matrices
+
+    async def run_async(self, circuits, meas_qubits=None, measure=None, count_chunks=False,
+                        use_cache=True, parameter_binds=None):
+        """
+        Coroutine version of run(). All chunks are submitted at once,
+        but only max_concurrent_jobs of them are in flight at the same time.
+        Parameters and return value are the same as in run().
+        """
+        if self.exact:
+            return [rho for _, rho in self._run_exact(circuits, meas_qubits, measure,
+                                                      parameter_binds)]
+
+        jobs, sorted_qubits, axes = self._prepare_jobs(circuits, meas_qubits, measure,
+                                                       parameter_binds)
+        plan = self._plan(jobs, use_cache, count_chunks=count_chunks)
+        self.saved_experiments = plan.saved_experiments
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_jobs) as executor:
+            # gather keeps the order of submission
+            results = await asyncio.gather(*[
+                loop.run_in_executor(executor, partial(self._execute_chunk, i, task_jobs, shots,
+                                                       part, count_chunks=count_chunks,
+                                                       transpiled=parameter_binds is not None))
+                for i, ((shots, _), task_jobs, part) in enumerate(zip(plan.tasks, plan.tasks_jobs(),
+                                                                      plan.parts))
+            ])
+
+        counts = plan.collect(results, self.cache)
+        matrices = self._fit(counts, jobs, sorted_qubits, axes, hashes=plan.hashes)
+        self._save(circuits, meas_qubits, matrices,
+                   self._labels_counts(jobs, counts, len(matrices)),
+                   parameter_binds=parameter_binds)
+        return matrices
+
+    def run_iter(self, circuits, meas_qubits=None, measure=None, count_chunks=False,
+                 use_cache=True, chunk_size=None):
+        """
+        Generator version of run(). Circuits are taken from the iterable and their tomography
+        circuits are built lazily and executed chunk by chunk. A density matrix is yielded
+        as soon as all its tomography experiments are finished, so memory is bounded by
+        the chunk size instead of the number of circuits.
+        Duplicates are searched only inside a chunk.
+        :param circuits: iterable (e.g. generator) of QuantumCircuit or CompositeChannel
+        :param chunk_size: int, the number of experiments in one chunk
+        (default: one job of the backend, but not more than MAX_JOBS_PER_ONE)
+        :return: generator of (index of circuit, density matrix)
+        """
+        if self.exact:
+            yield from self._run_exact(circuits, meas_qubits, measure)
+            return
         if measure is not None:
             raise NotImplementedError
 
-        if isinstance(circuits, QuantumCircuit):
-            circuits = [circuits]
-
-        meas_qubits, s_matrix = sort_list_and_transformation_matrix(meas_qubits)
+        original_qubits = meas_qubits
+        meas_qubits, axes = sort_list_and_permutation(meas_qubits)
         number_measure_experiments = 3**len(meas_qubits)
+        self.saved_experiments = 0
 
-        jobs = []
-        for qc in circuits:
-            qr = qc.qregs[0]
-            tomo_circuits = state_tomography_circuits(
-                qc, [qr[qubit_number] for qubit_number in meas_qubits]
+        # Circuits whose tomography circuits are built, but matrices aren't yielded yet
+        pending_circuits = deque()
+        labels, counts, hashes = [], [], []
+        circuit_index = 0
+        number_task = 0
+        jobs = self._iter_jobs(self._iter_circuits(circuits, pending_circuits), meas_qubits)
+        for chunk_jobs in chunks(jobs, chunk_size or min(self.max_experiments, MAX_JOBS_PER_ONE)):
+            plan = self._plan(chunk_jobs, use_cache, count_chunks=count_chunks)
+            self.saved_experiments += plan.saved_experiments
+            results = []
+            for (shots, _), task_jobs, part in zip(plan.tasks, plan.tasks_jobs(), plan.parts):
+                results.append(self._execute_chunk(number_task, task_jobs, shots, part,
+                                                   count_chunks=count_chunks))
+                number_task += 1
+
+            labels.extend(job.name for job in chunk_jobs)
+            counts.extend(plan.collect(results, self.cache))
+            hashes.extend(plan.hashes or [])
+            num_cregs = len(chunk_jobs[0].cregs)
+            del chunk_jobs, plan, results
+
+            number_groups = len(counts) // number_measure_experiments
+            if number_groups == 0:
+                continue
+            groups = [slice(k*number_measure_experiments, (k + 1)*number_measure_experiments)
+                      for k in range(number_groups)]
+            matrices = self._fit_groups(
+                [labels[group] for group in groups], [counts[group] for group in groups],
+                len(meas_qubits), num_cregs,
+                group_keys=[tuple(hashes[group]) for group in groups] if self.deduplicate else None
             )
-            jobs.extend(tomo_circuits)
-
-        res = None
-        for i, chunk_jobs in enumerate(chunks(jobs, self.max_jobs_per_one)):
-            if count_chunks:
-                print(f'chunk number: {i + 1}')
-            execute_kwargs = {
-                'experiments': chunk_jobs,
-                'backend': self.backend,
-                'shots': self.shots,
-                'max_credits': 15
-            }
-
-            new_res = execute(**execute_kwargs).result()
-            
-            if res is None:
-                res = new_res
-            else:
-                res.results.extend(new_res.results)
-
-        matrices = []
-        for i in range(int(len(res.results) / number_measure_experiments)):
-            res_matrix = copy(res)
-            res_matrix.results = res.results[
-                i*number_measure_experiments:(i + 1)*number_measure_experiments
-            ]
-
-            rho = StateTomographyFitter(
-                res_matrix,
-                jobs[i*number_measure_experiments:(i + 1)*number_measure_experiments]
-            ).fit()
-            rho = np.linalg.inv(s_matrix) @ rho @ s_matrix
-            matrices.append(rho)
+            matrices = [permute_density_matrix(rho, axes) for rho in matrices]
+            self._save([pending_circuits.popleft() for _ in range(number_groups)],
+                       original_qubits, matrices,
+                       [dict(zip(labels[group], counts[group])) for group in groups])
+            del labels[:number_groups*number_measure_experiments]
+            del counts[:number_groups*number_measure_experiments]
+            del hashes[:number_groups*number_measure_experiments]
+
+            for rho in matrices:
+                yield circuit_index, rho
+                circuit_index += 1
+
+    def run_batch(self, experiments, count_chunks=False, use_cache=True, progress=None):
+        """
+        Circuits with their own meas_qubits and shots are planned together, so experiments
+        of different circuits share jobs (see pack_experiments)
+        :param experiments: list of (circuit, meas_qubits, shots), shots can be None (self.shots)
+        :param progress: function(number of finished chunks, number of chunks) or None.
+        It's called after every executed chunk.
+        :return: list of density matrices, one per experiment
+        """
+        circuits = self._to_circuits([circuit for circuit, _, _ in experiments])
+        if self.exact:
+            self.saved_experiments = 0
+            matrices = [reduced_density_matrix(circuit, meas_qubits)
+                        for circuit, (_, meas_qubits, _) in zip(circuits, experiments)]
+            self._save([circuit for circuit, _, _ in experiments],
+                       [meas_qubits for _, meas_qubits, _ in experiments], matrices)
+            return matrices
+
+        jobs, jobs_shots, groups = [], [], []
+        for circuit, (_, meas_qubits, shots) in zip(circuits, experiments):
+            meas_qubits, axes = sort_list_and_permutation(meas_qubits)
+            circuit_jobs = tomography_circuits(circuit, meas_qubits)
+            groups.append((slice(len(jobs), len(jobs) + len(circuit_jobs)), len(meas_qubits), axes))
+            jobs.extend(circuit_jobs)
+            jobs_shots.extend([shots or self.shots] * len(circuit_jobs))
+
+        plan = self._plan(jobs, use_cache, count_chunks=count_chunks, jobs_shots=jobs_shots)
+        self.saved_experiments = plan.saved_experiments
+
+        task_jobs = plan.tasks_jobs()
+        task_shots = [shots for shots, _ in plan.tasks]
+        execute_chunk = partial(self._execute_chunk, count_chunks=count_chunks)
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_jobs) as executor:
+            results = []
+            # map keeps the order of submission
+            for result in executor.map(execute_chunk, range(len(task_jobs)), task_jobs,
+                                       task_shots, plan.parts):
+                results.append(result)
+                if progress is not None:
+                    progress(len(results), len(task_jobs))
+        counts = plan.collect(results, self.cache)
+
+        # Groups with the same number of qubits are fitted together
+        same_size = defaultdict(list)
+        for i, (group, num_qubits, _) in enumerate(groups):
+            same_size[num_qubits, len(jobs[group.start].cregs)].append(i)
+        matrices = [None] * len(groups)
+        for (num_qubits, num_cregs), indexes in same_size.items():
+            fitted = self._fit_groups(
+                [[job.name for job in jobs[groups[i][0]]] for i in indexes],
+                [counts[groups[i][0]] for i in indexes], num_qubits, num_cregs,
+                group_keys=[tuple(plan.owners[groups[i][0]]) for i in indexes]
+                if self.deduplicate else None
+            )
+            for i, rho in zip(indexes, fitted):
+                matrices[i] = permute_density_matrix(rho, groups[i][2])
+
+        self._save([circuit for circuit, _, _ in experiments],
+                   [meas_qubits for _, meas_qubits, _ in experiments], matrices,
+                   [dict(zip((job.name for job in jobs[group]), counts[group]))
+                    for group, _, _ in groups],
+                   shots=[shots for _, _, shots in experiments])
         return matrices
 
+    def _run_exact(self, circuits, meas_qubits, measure=None, parameter_binds=None):
+        """
+        :return: generator of (index of circuit, exact density matrix)
+        """
+        if measure is not None:
+            raise NotImplementedError
+        circuits = self._iter_circuits(circuits)
+        if parameter_binds is not None:
+            circuits = list(circuits)
+            circuits = [self._bind(circuit, bind)
+                        for bind in parameter_binds for circuit in circuits]
+        self.saved_experiments = 0
+
+        for i, circuit in enumerate(circuits):
+            rho = reduced_density_matrix(circuit, meas_qubits)
+            self._save([circuit], meas_qubits, [rho])
+            yield i, rho
+
+    @staticmethod
+    def _labels_counts(jobs, counts, number_matrices):
+        """
+        :return: list of dicts, name of tomography circuit -> counts, one dict per matrix
+        """
+        size = len(jobs) // number_matrices if number_matrices else 0
+        return [{job.name: job_counts for job, job_counts in zip(jobs[k*size:(k + 1)*size],
+                                                                 counts[k*size:(k + 1)*size])}
+                for k in range(number_matrices)]
+
+    def _save(self, circuits, meas_qubits, matrices, labels_counts=None, shots=None,
+              parameter_binds=None):
+        """
+        Append density matrices to the store if it's set
+        :param circuits: circuits as they're passed to run() (channels have metadata)
+        :param meas_qubits: list of qubits or list of lists of qubits (one per circuit)
+        :param labels_counts: list of dicts (name of tomography circuit -> counts) or None
+        :param shots: list of shots for every circuit or None (self.shots)
+        :param parameter_binds: list of dicts or None, see run()
+        """
+        if self.store is None:
+            return
+        if isinstance(circuits, (QuantumCircuit, CompositeChannel)):
+            circuits = [circuits]
+        if not meas_qubits or not isinstance(meas_qubits[0], (list, tuple)):
+            meas_qubits = [meas_qubits] * len(circuits)
+        shots = shots or [None] * len(circuits)
+
+        metadata = []
+        for bind in parameter_binds if parameter_binds is not None else [{}]:
+            for circuit, circuit_qubits, circuit_shots in zip(circuits, meas_qubits, shots):
+                record = {
+                    # Channels and composite channels have theory_dim, plain circuits don't
+                    'channel': type(circuit).__name__ if hasattr(circuit, 'theory_dim') else None,
+                    'mask': getattr(circuit, 'mask', None),
+                    'backend': self.backend.name(),
+                    'shots': None if self.exact else circuit_shots or self.shots,
+                    'name': getattr(circuit, 'name', None),
+                    'meas_qubits': circuit_qubits,
+                    'exact': self.exact
+                }
+                channel_parameters = getattr(circuit, 'channel_parameters', None)
+                if channel_parameters:
+                    record['parameters'] = {name: bind.get(value, value)
+                                            for name, value in channel_parameters.items()}
+                metadata.append(record)
+        self.store.append_many(RHO, matrices, labels_counts, metadata)
+
+    @classmethod
+    def _to_circuits(cls, circuits):
+        """
+        :param circuits: QuantumCircuit, CompositeChannel or list of them
+        :return: list of QuantumCircuit, composite channels are concatenated
+        """
+        return list(cls._iter_circuits(circuits))
+
+    @staticmethod
+    def _iter_circuits(circuits, originals=None):
+        """
+        Generator of QuantumCircuit, composite channels are concatenated when they're reached
+        :param circuits: QuantumCircuit, CompositeChannel or iterable of them
+        :param originals: deque or None, every taken circuit is appended there as it is
+        """
+        if isinstance(circuits, (QuantumCircuit, CompositeChannel)):
+            circuits = [circuits]
+        for circuit in circuits:
+            if originals is not None:
+                originals.append(circuit)
+            yield circuit.to_circuit() if isinstance(circuit, CompositeChannel) else circuit
+
+    @classmethod
+    def _prepare_circuits(cls, circuits, meas_qubits, measure=None):
+        """
+        :return: (list of QuantumCircuit, sorted meas_qubits, axes for permute_density_matrix)
+        """
+        if measure is not None:
+            raise NotImplementedError
+
+        circuits = cls._to_circuits(circuits)
+        meas_qubits, axes = sort_list_and_permutation(meas_qubits)
+        return circuits, meas_qubits, axes
+
+    @staticmethod
+    def _iter_jobs(circuits, meas_qubits):
+        """
+        Generator of tomography circuits
+        :param meas_qubits: sorted list of qubits
+        """
+        for qc in circuits:
+            yield from tomography_circuits(qc, meas_qubits)
+
+    def _prepare_jobs(self, circuits, meas_qubits, measure=None, parameter_binds=None):
+        """
+        Build tomography circuits
+        :param parameter_binds: list of dicts or None, see run()
+        :return: (list of QuantumCircuit, sorted meas_qubits, axes for permute_density_matrix)
+        """
+        circuits, meas_qubits, axes = self._prepare_circuits(circuits, meas_qubits, measure)
+        jobs = list(self._iter_jobs(circuits, meas_qubits))
+        if parameter_binds is not None:
+            jobs = self._bind_jobs(jobs, parameter_binds)
+        return jobs, meas_qubits, axes
+
+    def _bind_jobs(self, jobs, parameter_binds):
+        """
+        Tomography circuits with parameters are transpiled once for the backend,
+        parameters are bound in transpiled circuits.
+        :return: list of transpiled QuantumCircuit, all jobs for every bind
+        (groups of tomography circuits stay together)
+        """
+        transpiled_jobs = self._transpile(jobs)
+        return [self._bind(circuit, bind, job)
+                for bind in parameter_binds for job, circuit in zip(jobs, transpiled_jobs)]
+
+    @staticmethod
+    def _bind(circuit, bind, original=None):
+        """
+        Only parameters of the circuit are bound, so circuits with and without parameters
+        can be run with the same parameter_binds
+        :param bind: dict, qiskit Parameter -> number
+        :param original: QuantumCircuit or None. Parameters of a circuit taken from
+        transpile_cache are unpickled copies of parameters of the original circuit,
+        they're bound by names of parameters of the original circuit.
+        :return: QuantumCircuit, a copy of circuit
+        """
+        names = {} if original is None else {parameter.name: parameter
+                                             for parameter in original.parameters}
+        value_dict = {}
+        for parameter in circuit.parameters:
+            key = parameter if parameter in bind else names.get(parameter.name)
+            if key in bind:
+                value_dict[parameter] = bind[key]
+        return circuit.bind_parameters(value_dict)
+
+    def _transpile(self, jobs):
+        """
+        Transpile jobs for the backend, transpiled circuits are taken from transpile_cache
+        if it's set
+        :return: list of QuantumCircuit
+        """
+        if self.transpile_cache is None:
+            return self._transpile_circuits(jobs)
+
+        fingerprint = self.transpile_cache.configuration_fingerprint(self.backend,
+                                                                     self.optimization_level)
+        keys = [self.transpile_cache.key(job, fingerprint, self.optimization_level)
+                if self._is_cacheable(job) else None for job in jobs]
+        # Every entry is unpickled separately, so jobs don't share circuits
+        transpiled_jobs = [None if key is None else self.transpile_cache.get(key) for key in keys]
+
+        for job, circuit in zip(jobs, transpiled_jobs):
+            if circuit is not None:
+                # The entry could be saved for another job with the same hash
+                circuit.name = job.name
+
+        missing = [i for i, circuit in enumerate(transpiled_jobs) if circuit is None]
+        if missing:
+            for i, circuit in zip(missing, self._transpile_circuits([jobs[i] for i in missing])):
+                transpiled_jobs[i] = circuit
+            self.transpile_cache.set_many({keys[i]: transpiled_jobs[i]
+                                           for i in missing if keys[i] is not None})
+        return transpiled_jobs
+
+    def _transpile_circuits(self, jobs):
+        circuits = transpile(jobs, self.backend, optimization_level=self.optimization_level)
+        return [circuits] if isinstance(circuits, QuantumCircuit) else circuits
+
+    @staticmethod
+    def _is_cacheable(job):
+        """
+        Parameters of an unpickled circuit are new objects, they're bound by names
+        (see _bind()). So a job is cached only if names of its parameters are unique.
+        """
+        parameters = job.parameters
+        return len({parameter.name for parameter in parameters}) == len(parameters)
+
+    def _plan(self, jobs, use_cache=True, count_chunks=False, jobs_shots=None):
+        """
+        Deduplicate experiments, look for them in the cache and split the rest into chunks.
+        :param use_cache: bool. If it's False, the cache isn't read (but it's written).
+        :param jobs_shots: list of shots for every job (default: self.shots for all of them).
+        Jobs are deduplicated only if they have the same shots.
+        :return: ExecutionPlan
+        """
+        hashes = None
+        if self.deduplicate or self.cache is not None:
+            hashes = [circuit_hash(job) for job in jobs]
+        if jobs_shots is None:
+            jobs_shots = [self.shots] * len(jobs)
+
+        if self.deduplicate:
+            experiments = {}
+            owners = [experiments.setdefault((job_hash, job_shots), len(experiments))
+                      for job_hash, job_shots in zip(hashes, jobs_shots)]
+        else:
+            owners = list(range(len(jobs)))
+        number_experiments = max(owners) + 1 if owners else 0
+
+        shots = [0] * number_experiments
+        for owner, job_shots in zip(owners, jobs_shots):
+            if self.combine_shots or not shots[owner]:
+                shots[owner] += job_shots
+
+        plan = ExecutionPlan(jobs, hashes, owners, shots, None, [None] * number_experiments, [])
+        if self.cache is not None:
+            plan.keys = [self.cache.key(hashes[job], self.backend.name(), shots[experiment],
+                                        self.seed)
+                         for experiment, job in enumerate(plan.representatives)]
+            if use_cache:
+                plan.counts = self.cache.get_many(plan.keys)
+
+        missing = {experiment: shots[experiment]
+                   for experiment, experiment_counts in enumerate(plan.counts)
+                   if experiment_counts is None}
+        plan.tasks = pack_experiments(missing, self.max_experiments, self.max_shots)
+
+        if count_chunks and plan.saved_experiments:
+            print(f'saved experiments: {plan.saved_experiments}')
+        return plan
+
+    def _execute_chunk(self, number, chunk_jobs, shots=None, part=0, count_chunks=False,
+                       transpiled=False):
+        """
+        :param shots: int, self.shots by default
+        :param part: int, index of the part of split shots (see pack_experiments). Parts of
+        an experiment are sampled with different seeds (seed + part), so merged counts
+        aren't copies of the same samples
+        :param transpiled: bool. Jobs are already transpiled for the backend,
+        otherwise they're transpiled (or taken from transpile_cache) here
+        :return: list of counts
+        """
+        if count_chunks:
+            print(f'chunk number: {number + 1}')
+        if not transpiled:
+            chunk_jobs = self._transpile(chunk_jobs)
+
+        assemble_kwargs = {
+            'backend': self.backend,
+            'shots': shots or self.shots,
+            'max_credits': 15
+        }
+        if self.seed is not None:
+            assemble_kwargs['seed_simulator'] = self.seed + part
+
+        result = self.backend.run(assemble(chunk_jobs, **assemble_kwargs)).result()
+        return [result.get_counts(i) for i in range(len(chunk_jobs))]
+
+    def _fit(self, counts, jobs, meas_qubits, axes, hashes=None):
+        """
+        :param hashes: list of circuit_hash of jobs. If it's given and deduplicate is set,
+        identical groups of experiments are fitted once.
+        """
+        if not jobs:
+            return []
+        number_measure_experiments = 3**len(meas_qubits)
+
+        # Only names and counts are sent to fitters
+        labels = [job.name for job in jobs]
+        num_cregs = len(jobs[0].cregs)
+
+        groups = [slice(i*number_measure_experiments, (i + 1)*number_measure_experiments)
+                  for i in range(int(len(counts) / number_measure_experiments))]
+        labels_groups = [labels[group] for group in groups]
+        counts_groups = [counts[group] for group in groups]
+        group_keys = None
+        if self.deduplicate and hashes is not None:
+            group_keys = [tuple(hashes[group]) for group in groups]
+
+        matrices = self._fit_groups(labels_groups, counts_groups, len(meas_qubits), num_cregs,
+                                    group_keys=group_keys)
+        return list(permute_density_matrix(np.array(matrices), axes))
+
+    def _fit_groups(self, labels_groups, counts_groups, num_qubits, num_cregs, group_keys=None):
+        """
+        :param labels_groups: list of lists of names of tomography circuits for every matrix
+        :param counts_groups: list of lists of counts in the same order
+        :param group_keys: list of hashable or None. Groups with the same key are fitted once
+        :return: list of density matrices (in order of sorted meas_qubits)
+        """
+        if group_keys is not None:
+            unique_groups = {}
+            owners = [unique_groups.setdefault(key, i) for i, key in enumerate(group_keys)]
+            first_groups = sorted(set(owners))
+            matrices = self._fit_groups([labels_groups[i] for i in first_groups],
+                                        [counts_groups[i] for i in first_groups],
+                                        num_qubits, num_cregs)
+            position = {group: i for i, group in enumerate(first_groups)}
+            return [matrices[position[owner]] for owner in owners]
+
+        if self.fitter == LINEAR_FITTER:
+            return list(LinearInversionFitter(num_qubits).fit_counts(labels_groups, counts_groups))
 
+        if self.fit_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.fit_workers) as executor:
+                # map keeps the order of groups
+                return list(executor.map(fit_tomography_counts, labels_groups, counts_groups,
+                                         repeat(num_cregs)))
+        return list(map(fit_tomography_counts, labels_groups, counts_groups, repeat(num_cregs)))
@@ -1,10 +1,11 @@
-import sys, os, re, argparse, datetime
-from importlib import import_module
+import sys, os, argparse, datetime
 
-from qiskit import IBMQ, BasicAer
+import numpy as np
 
-from Qconfig import tokens, config
-from qchannels.core.tools import IBMQ_SIMULATOR, BACKENDS, LOCAL_SIMULATOR
+from qchannels.core.tools import LOCAL_SIMULATOR, LOCAL_BACKENDS, CHANNELS
+from qchannels.core.tools import get_backends, add_backends, get_channel_class
+from qchannels.core.cache import ResultCache
+from qchannels.core.store import ResultStore
 
 
 class DefaultArgumentParser(argparse.ArgumentParser):
@@ -18,19 +19,28 @@ class DefaultArgumentParser(argparse.ArgumentParser):
         self.add_argument('-s', '--shots', type=int, default=8192,
                           help='Number of shots in experiment (default: %(default)s)')
         self.add_argument('-c', '--channel', type=str, default='Landau-Streater',
+                          choices=get_channel_names(),
                           help=f"Name of channel from {get_channel_names()} (default: %(default)s)")
         self.add_argument('--show-backends', action='store_true',
-                          help='Show available backends(the backend might be on maintenance)')
+                          help='Show available backends(the backend might be on maintenance). '
+                               'Remote backends are shown for a remote backend or --remote')
+        self.add_argument('--remote', action='store_true',
+                          help='Log in to IBMQ even if the backend is local')
         self.add_argument('-f', '--file', action='store_true',
                           help='Redirect output to file')
+        self.add_argument('--store', action='store_true',
+                          help='Append counts, density matrices and Choi matrices with metadata '
+                               'to the indexed results store in outputs/store')
+        self.add_argument('--cache', action='store_true',
+                          help='Take counts of already executed experiments from the cache '
+                               '(don\'t use it if fresh data from real hardware is required)')
+        self.add_argument('--exact', action='store_true',
+                          help='Calculate exact density matrices by numpy simulation '
+                               'instead of tomography on the backend')
 
 
 def get_channel_names():
-    channel_class_names = map(lambda x: x.replace('Circuit', ''),
-                              filter(lambda x: 'Circuit' in x and 'AbstractChannel' not in x,
-                                     dir(import_module('qchannels.channels'))))
-    return list(map(lambda class_name: '-'.join([s for s in re.split("([A-Z][^A-Z]*)", class_name) if s]),
-                    channel_class_names))
+    return list(CHANNELS)
 
 
 def set_parameters(description='Test Channels', parser_class=None, additional_argument_list=None):
@@ -47,22 +57,28 @@ def set_parameters(description='Test Channels', parser_class=None, additional_ar
             parser.add_argument(*additional_argument[0], **additional_argument[1])
 
     args = parser.parse_args()
-    if args.token is not None:
-        token = args.token
-    else:
-        token = tokens[args.num_token]
+    np.set_printoptions(threshold=sys.maxsize)
+
+    # Log in only if it's necessary, it takes a lot of time
+    token = None
+    if args.backend not in LOCAL_BACKENDS or args.remote:
+        if args.token is not None:
+            token = args.token
+        else:
+            from Qconfig import tokens
+            token = tokens[args.num_token]
 
-    provider = IBMQ.enable_account(token)
+        from qiskit import IBMQ
+        provider = IBMQ.enable_account(token)
+        add_backends(provider.backends())
 
-    global BACKENDS
-    BACKENDS += provider.backends()
     if args.show_backends:
-        for backend in BACKENDS:
+        for backend in get_backends():
             print(backend.name())
         sys.exit()
 
+    exec_file = os.path.basename(sys.argv[0])[:-3]
     if args.file:
-        exec_file = os.path.basename(sys.argv[0])[:-3]
         output_dir = 'outputs'
         if not os.path.exists(output_dir):
             os.mkdir(output_dir)
@@ -72,13 +88,15 @@ def set_parameters(description='Test Channels', parser_class=None, additional_ar
         sys.stdout = open(filename, 'a')
         sys.stderr = open(filename, 'a')
 
-    channel_class = getattr(import_module('qchannels.channels'),
-                            args.channel.replace('-', '') + 'Circuit')
+    channel_class = get_channel_class(args.channel)
 
     return {
         'token': token,
         'backend_name': args.backend,
         'shots': args.shots,
         'channel_class': channel_class,
+        'cache': ResultCache() if args.cache else None,
+        'exact': args.exact,
+        'store': ResultStore(script=exec_file) if args.store else None,
         'args': args  # args can have additional field that isn't covered recently
     }
@@ -0,0 +1,71 @@
+from collections import Counter, defaultdict
+
+from qchannels.core.tools import MAX_JOBS_PER_ONE, SIMULATORS
+
+
+def get_backend_limits(backend):
+    """
+    Limits of one job of the backend. If the configuration doesn't report max_experiments,
+    MAX_JOBS_PER_ONE is used for devices and there is no limit for simulators.
+    :param backend: BaseBackend
+    :return: (max_experiments: int, max_shots: int or None)
+    """
+    configuration = backend.configuration()
+    max_experiments = getattr(configuration, 'max_experiments', None)
+    if max_experiments is None:
+        max_experiments = 10**6 if backend.name() in SIMULATORS else MAX_JOBS_PER_ONE
+    return max_experiments, getattr(configuration, 'max_shots', None)
+
+
+def split_shots(shots, max_shots=None):
+    """
+    :return: list of int, parts of shots, every part isn't bigger than max_shots
+    """
+    if max_shots is None or shots <= max_shots:
+        return [shots]
+    return [max_shots] * (shots // max_shots) + ([shots % max_shots] if shots % max_shots else [])
+
+
+def pack_experiments(experiments_shots, max_experiments, max_shots=None):
+    """
+    Pack experiments into jobs. All experiments of a job have the same shots,
+    an experiment with more than max_shots shots is executed in several jobs.
+    A job contains the same part (see split_shots) of all its experiments and jobs are ordered
+    by parts, so parts of one experiment can be sampled with different seeds (see part_indexes).
+    :param experiments_shots: dict, index of experiment -> shots
+    :return: list of (shots, list of indexes of experiments), one item per job
+    """
+    parts = defaultdict(list)
+    for experiment, shots in experiments_shots.items():
+        for part, part_shots in enumerate(split_shots(shots, max_shots)):
+            parts[part, part_shots].append(experiment)
+
+    tasks = []
+    for (_, shots), experiments in sorted(parts.items(), key=lambda item: item[0]):
+        tasks.extend((shots, experiments[i:i + max_experiments])
+                     for i in range(0, len(experiments), max_experiments))
+    return tasks
+
+
+def part_indexes(tasks):
+    """
+    :param tasks: list of (shots, list of indexes of experiments), see pack_experiments()
+    :return: list, index of the part of split shots for every task (0 if shots aren't split)
+    """
+    seen = Counter()
+    indexes = []
+    for _, experiments in tasks:
+        indexes.append(seen[experiments[0]])
+        seen.update(experiments)
+    return indexes
+
+
+def merge_counts(*counts):
+    """
+    :param counts: dicts of counts of the same experiment
+    :return: dict, sum of counts
+    """
+    merged = Counter()
+    for experiment_counts in counts:
+        merged.update(experiment_counts)
+    return dict(merged)
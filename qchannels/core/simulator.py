@@ -0,0 +1,198 @@
+from cmath import exp
+from math import cos, sin
+
+import numpy as np
+
+# Matrices of gates. For multi-qubit gates the first qubit is the least significant bit
+# (as in to_matrix() of qiskit gates).
+X = np.array([[0, 1], [1, 0]], dtype=complex)
+Y = np.array([[0, -1j], [1j, 0]], dtype=complex)
+Z = np.diag([1, -1]).astype(complex)
+H = np.array([[1, 1], [1, -1]], dtype=complex)/np.sqrt(2)
+
+
+def u3_matrix(theta, phi, lam):
+    return np.array([
+        [cos(theta/2), -exp(1j*lam)*sin(theta/2)],
+        [exp(1j*phi)*sin(theta/2), exp(1j*(phi + lam))*cos(theta/2)]
+    ])
+
+
+def controlled(matrix):
+    """
+    :param matrix: np.array(2, 2), gate on the target (the second qubit)
+    :return: np.array(4, 4), the control is the first qubit
+    """
+    result = np.eye(4, dtype=complex)
+    result[1::2, 1::2] = matrix
+    return result
+
+
+GATES = {
+    'id': lambda: np.eye(2, dtype=complex),
+    'x': lambda: X,
+    'y': lambda: Y,
+    'z': lambda: Z,
+    'h': lambda: H,
+    's': lambda: np.diag([1, 1j]),
+    'sdg': lambda: np.diag([1, -1j]),
+    't': lambda: np.diag([1, exp(1j*np.pi/4)]),
+    'tdg': lambda: np.diag([1, exp(-1j*np.pi/4)]),
+    'u0': lambda m: np.eye(2, dtype=complex),
+    'u1': lambda lam: np.diag([1, exp(1j*lam)]),
+    'u2': lambda phi, lam: u3_matrix(np.pi/2, phi, lam),
+    'u3': u3_matrix,
+    'U': u3_matrix,
+    'rx': lambda theta: u3_matrix(theta, -np.pi/2, np.pi/2),
+    'ry': lambda theta: u3_matrix(theta, 0, 0),
+    'rz': lambda phi: np.diag([exp(-1j*phi/2), exp(1j*phi/2)]),
+    'cx': lambda: controlled(X),
+    'CX': lambda: controlled(X),
+    'cy': lambda: controlled(Y),
+    'cz': lambda: controlled(Z),
+    'ch': lambda: controlled(H),
+    'cu1': lambda lam: controlled(np.diag([1, exp(1j*lam)])),
+    'swap': lambda: np.eye(4, dtype=complex)[[0, 2, 1, 3]],
+}
+SKIPPED_INSTRUCTIONS = {'barrier', 'snapshot'}
+
+
+def get_gate_matrix(instruction):
+    """
+    :param instruction: qiskit Instruction
+    :return: np.array or None if the matrix isn't known (the definition has to be used)
+    """
+    if instruction.name in GATES:
+        return np.asarray(GATES[instruction.name](*map(float, instruction.params)), dtype=complex)
+    to_matrix = getattr(instruction, 'to_matrix', None)
+    if to_matrix is not None:
+        try:
+            return to_matrix()
+        except Exception:
+            return None
+    return None
+
+
+class StatevectorSimulator:
+    """
+    Exact simulation of unitary circuits by NumPy. The state is a tensor with one axis per qubit,
+    a gate is applied by tensordot with its axes only.
+    """
+    def __init__(self, circuit, initial_state=0):
+        """
+        :param circuit: QuantumCircuit without measurements
+        :param initial_state: int, index of the initial basis state (the first qubit of the first
+        register is the least significant bit)
+        """
+        self.offsets = {}
+        self.num_qubits = 0
+        for reg in circuit.qregs:
+            self.offsets[reg] = self.num_qubits
+            self.num_qubits += reg.size
+
+        self.state = np.zeros(2**self.num_qubits, dtype=complex)
+        self.state[initial_state] = 1
+        self.state = self.state.reshape((2,)*self.num_qubits)
+        self.apply_instructions(circuit.data)
+
+    def axis(self, qubit):
+        """
+        Axes are in big-endian order, so state.reshape(-1) is the usual statevector
+        :param qubit: (QuantumRegister, int)
+        """
+        reg, index = qubit
+        return self.num_qubits - 1 - (self.offsets[reg] + index)
+
+    def apply_instructions(self, data, qubits_map=None):
+        """
+        :param data: list of (Instruction, qargs, cargs)
+        :param qubits_map: dict, qargs of data -> qubits of the circuit (for definitions)
+        """
+        for instruction, qargs, _ in data:
+            if qubits_map is not None:
+                qargs = [qubits_map[qubit] for qubit in qargs]
+            if instruction.name in SKIPPED_INSTRUCTIONS:
+                continue
+
+            matrix = get_gate_matrix(instruction)
+            if matrix is not None:
+                self.apply_matrix(matrix, qargs)
+            elif instruction.definition:
+                definition_qubits = {qubit for _, def_qargs, _ in instruction.definition
+                                     for qubit in def_qargs}
+                definition_reg = next(iter(definition_qubits))[0]
+                self.apply_instructions(
+                    instruction.definition,
+                    {(definition_reg, i): qubit for i, qubit in enumerate(qargs)}
+                )
+            else:
+                raise ValueError(f"Instruction {instruction.name} can't be simulated exactly")
+
+    def apply_matrix(self, matrix, qargs):
+        """
+        :param matrix: np.array(2**m, 2**m), qargs[0] is the least significant bit
+        :param qargs: list of m qubits
+        """
+        m = len(qargs)
+        axes = [self.axis(qubit) for qubit in reversed(qargs)]
+        self.state = np.tensordot(matrix.reshape((2,)*(2*m)), self.state,
+                                  axes=(list(range(m, 2*m)), axes))
+        self.state = np.moveaxis(self.state, list(range(m)), axes)
+
+    def split_state(self, qubits):
+        """
+        :param qubits: list of qubits, qubits[0] is the least significant bit of rows
+        :return: np.array(2**len(qubits), 2**(num_qubits - len(qubits))), the state as a matrix,
+        a row is a state of qubits, a column is a state of other qubits
+        """
+        axes = [self.axis(qubit) for qubit in reversed(qubits)]
+        rest = [axis for axis in range(self.num_qubits) if axis not in axes]
+        return np.transpose(self.state, axes + rest).reshape(2**len(qubits), -1)
+
+    def reduced_density_matrix(self, qubits):
+        """
+        :param qubits: list of qubits, qubits[0] is the least significant bit of the result
+        :return: np.array(2**len(qubits), 2**len(qubits)), other qubits are traced out
+        """
+        psi = self.split_state(qubits)
+        return psi @ np.conj(psi.T)
+
+
+def reduced_density_matrix(circuit, meas_qubits):
+    """
+    Exact density matrix of meas_qubits after the circuit (started from |0...0>).
+    :param circuit: QuantumCircuit without measurements
+    :param meas_qubits: list of qubits of the first register of circuit.
+    The order is the same as in Launcher.run()
+    :return: np.array
+    """
+    qr = circuit.qregs[0]
+    return StatevectorSimulator(circuit).reduced_density_matrix([(qr, qubit)
+                                                                for qubit in meas_qubits])
+
+
+def choi_matrix(circuit, system_qubits, dim=None):
+    """
+    Choi matrix of the channel on system_qubits, all other qubits of the first register
+    start from |0> and are traced out. The convention is the same as
+    in create_choi_matrix_from_channel(): C[i*dim + a, j*dim + b] = Channel(|i><j|)[a, b]/dim.
+    :param circuit: QuantumCircuit without measurements
+    :param system_qubits: list of qubits of the first register, the first one is
+    the least significant bit of the system state
+    :param dim: int, the channel acts on first dim states of system qubits
+    (default: 2**len(system_qubits))
+    :return: np.array(dim**2, dim**2)
+    """
+    if dim is None:
+        dim = 2**len(system_qubits)
+    qr = circuit.qregs[0]
+    qubits = [(qr, qubit) for qubit in system_qubits]
+
+    # outputs[i, a, e] = <a, e| U |i, 0>
+    outputs = np.array([
+        StatevectorSimulator(circuit, initial_state=sum(
+            ((i >> k) & 1) << qubit for k, qubit in enumerate(system_qubits)
+        )).split_state(qubits)[:dim]
+        for i in range(dim)
+    ])
+    return np.einsum('iae,jbe->iajb', outputs, np.conj(outputs)).reshape(dim**2, dim**2)/dim
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from qchannels.core.tools import RHO, CHOI, COUNTS
+
+DEFAULT_STORE_DIR = os.path.join('outputs', 'store')
+
+# Columns of the index that can be used in ResultStore.query()
+COLUMNS = ['kind', 'channel', 'mask', 'backend', 'shots', 'name', 'meas_qubits', 'script',
+           'timestamp']
+
+# Index columns and the location of the matrix, metadata and counts are loaded on demand
+StoredRecord = namedtuple('StoredRecord', ['id', *COLUMNS, 'dtype', 'shape', 'offset'])
+
+_ROW_COLUMNS = [*COLUMNS, 'metadata', 'dtype', 'shape', 'offset', 'counts']  # of append_many()
+_OFFSET_INDEX = _ROW_COLUMNS.index('offset')
+
+
+@contextmanager
+def _locked(path):
+    """
+    Exclusive lock of a lock file shared by processes, it's released on exit
+    :param path: str, the file is created if it doesn't exist
+    """
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+            return
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:  # LK_LOCK gives up after 10 attempts
+                pass
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ResultStore:
+    """
+    Append-only store of results. Matrices (density matrices, Choi matrices) are written
+    as raw bytes to one binary file, the file is memory-mapped on reading, so a stored matrix
+    is loaded only when it's used. Metadata (channel, mask, backend, shots, timestamp, etc.)
+    and raw counts are in an SQLite index with indexes on the main columns. query() reads
+    only the main columns, counts and the rest of metadata are decoded by load_counts()
+    and load_metadata().
+    """
+    DATA_FILE = 'data.bin'
+    LOCK_FILE = 'data.lock'
+    INDEX_FILE = 'index.sqlite'
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, script=None):
+        """
+        :param directory: str, it will be created if it doesn't exist
+        :param script: str or None, the default value of script column of appended records
+        """
+        self.directory = directory
+        self.script = script
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, self.DATA_FILE)
+        self.lock_path = os.path.join(directory, self.LOCK_FILE)
+        self._data = None  # memmap of the data file, it's reopened when the file grows
+
+        self.connection = sqlite3.connect(os.path.join(directory, self.INDEX_FILE))
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT, channel TEXT, mask TEXT, backend TEXT, shots INTEGER,
+                    name TEXT, meas_qubits TEXT, script TEXT, timestamp REAL,
+                    metadata TEXT, dtype TEXT, shape TEXT, offset INTEGER, counts TEXT
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS experiment "
+                                    "ON records (kind, channel, backend, shots)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS time ON records (timestamp)")
+
+    @staticmethod
+    def _encode(column, value):
+        if value is None:
+            return None
+        if column == 'mask':
+            # JSON keys are strings, so masks are compared as sorted items
+            return json.dumps(sorted(value.items()))
+        if column == 'meas_qubits':
+            return json.dumps(list(value))
+        return value
+
+    def append(self, kind, matrix=None, counts=None, **metadata):
+        """
+        :param kind: str, RHO, CHOI, COUNTS or any other
+        :param matrix: np.array or None
+        :param counts: json serializable (e.g. dict or list of dicts of counts) or None
+        :param metadata: values of COLUMNS (timestamp is now by default), the rest is saved
+        as JSON in metadata
+        :return: int, id of the record
+        """
+        return self.append_many(kind, [matrix], [counts], [metadata])[0]
+
+    def append_many(self, kind, matrices, counts=None, metadata=None):
+        """
+        All matrices are written by one write and one transaction. The data file is locked
+        (by LOCK_FILE) while it's written, so several processes can append to one store.
+        :param matrices: list of np.array or None
+        :param counts: list of counts or None
+        :param metadata: list of dicts or None, see append()
+        :return: list of ids
+        """
+        number = len(matrices)
+        counts = counts if counts is not None else [None] * number
+        metadata = metadata if metadata is not None else [{}] * number
+        timestamp = time.time()
+
+        rows, chunks = [], []
+        size = 0  # offsets are relative to the end of the file until it's locked
+        for matrix, record_counts, record_metadata in zip(matrices, counts, metadata):
+            record_metadata = {'script': self.script, **record_metadata}
+            row = [kind] + [self._encode(column, record_metadata.pop(column, None))
+                            for column in COLUMNS[1:-1]]
+            row.append(record_metadata.pop('timestamp', timestamp))
+            row.append(json.dumps(record_metadata, default=str) if record_metadata else None)
+            if matrix is None:
+                row.extend([None, None, None])
+            else:
+                matrix = np.ascontiguousarray(matrix)
+                row.extend([matrix.dtype.str, json.dumps(matrix.shape), size])
+                chunks.append(matrix.tobytes())
+                size += matrix.nbytes
+            row.append(None if record_counts is None else json.dumps(record_counts))
+            rows.append(row)
+
+        # Other processes can append to the file at the same time
+        with _locked(self.lock_path), open(self.data_path, 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(b''.join(chunks))
+            f.flush()
+        for row in rows:
+            if row[_OFFSET_INDEX] is not None:
+                row[_OFFSET_INDEX] += offset
+
+        with self.connection:
+            cursor = self.connection.cursor()
+            ids = []
+            for row in rows:
+                cursor.execute(f"INSERT INTO records ({', '.join(_ROW_COLUMNS)}) "
+                               f"VALUES ({', '.join('?' * len(row))})", row)
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def query(self, since=None, until=None, **filters):
+        """
+        :param since: float or None, timestamp
+        :param until: float or None, timestamp
+        :param filters: values of COLUMNS, e.g. kind=RHO, channel='LandauStreaterCircuit'.
+        A list of values means any of them.
+        :return: list of StoredRecord in order of appending, matrices, metadata and counts
+        aren't loaded, see load(), load_metadata() and load_counts()
+        """
+        conditions, arguments = [], []
+        for column, value in filters.items():
+            if column not in COLUMNS:
+                raise ValueError(f"Unknown column {column}")
+            values = value if isinstance(value, (list, tuple, set)) and column != 'meas_qubits' \
+                else [value]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            arguments.extend(self._encode(column, value) for value in values)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            arguments.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            arguments.append(until)
+
+        sql = f"SELECT {', '.join(StoredRecord._fields)} FROM records"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return [self._decode(row)
+                for row in self.connection.execute(sql + " ORDER BY id", arguments)]
+
+    @staticmethod
+    def _decode(row):
+        record = StoredRecord(*row)
+        return record._replace(
+            mask=None if record.mask is None else {key: value for key, value
+                                                   in json.loads(record.mask)},
+            meas_qubits=None if record.meas_qubits is None else json.loads(record.meas_qubits),
+            shape=None if record.shape is None else tuple(json.loads(record.shape))
+        )
+
+    def _load_json(self, column, record):
+        value, = self.connection.execute(f"SELECT {column} FROM records WHERE id = ?",
+                                         (record.id,)).fetchone()
+        return None if value is None else json.loads(value)
+
+    def load_metadata(self, record):
+        """
+        :param record: StoredRecord
+        :return: dict, metadata of append() that isn't in COLUMNS
+        """
+        return self._load_json('metadata', record) or {}
+
+    def load_counts(self, record):
+        """
+        :param record: StoredRecord
+        :return: counts of append() or None
+        """
+        return self._load_json('counts', record)
+
+    def _mapped_data(self, end):
+        if self._data is None or len(self._data) < end:
+            self._data = np.memmap(self.data_path, dtype=np.uint8, mode='r')
+        return self._data
+
+    def load(self, record):
+        """
+        :param record: StoredRecord
+        :return: read-only np.array backed by the memory-mapped file or None if the record
+        doesn't have a matrix
+        """
+        if record.shape is None:
+            return None
+        dtype = np.dtype(record.dtype)
+        size = int(np.prod(record.shape))*dtype.itemsize
+        data = self._mapped_data(record.offset + size)
+        return np.ndarray(record.shape, dtype=dtype, buffer=data, offset=record.offset)
+
+    def load_stack(self, records):
+        """
+        :param records: list of StoredRecord with matrices of the same shape
+        :return: np.array(len(records), *shape), it's copied to memory
+        """
+        return np.array([self.load(record) for record in records])
+
+    def close(self):
+        self._data = None
+        self.connection.close()
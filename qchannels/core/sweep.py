@@ -0,0 +1,100 @@
+from collections import namedtuple, defaultdict
+from itertools import product
+
+import numpy as np
+
+from qchannels.core.launcher import Launcher
+from qchannels.core.theory import fidelity
+from qchannels.core.tools import LOCAL_SIMULATOR, get_channel_class
+
+SweepPoint = namedtuple('SweepPoint', ['channel_class', 'mask', 'shots', 'backend_name'])
+
+
+class Sweep:
+    """
+    Declarative grid of experiments: every channel class with every mask, number of shots
+    and backend. Points of one backend are executed by one Launcher in shared jobs
+    (see Launcher.run_batch), so the whole grid runs in one process with one login.
+    A channel is applied to |0...0>, the state of its system qubits is reconstructed and
+    compared with the theory channel.
+    """
+    def __init__(self, channel_classes, masks=None, shots=None, backend_names=None,
+                 token=None, **launcher_kwargs):
+        """
+        :param channel_classes: list of subclasses of AbstractChannelCircuit or names of CHANNELS
+        :param masks: list of masks of channels (default: [{}])
+        :param shots: list of int (default: [8192])
+        :param backend_names: list of str (default: [LOCAL_SIMULATOR])
+        :param launcher_kwargs: other arguments of Launcher
+        (cache, deduplicate, exact, store, etc.)
+        """
+        self.channel_classes = [get_channel_class(channel_class)
+                                if isinstance(channel_class, str) else channel_class
+                                for channel_class in channel_classes]
+        self.masks = masks if masks is not None else [{}]
+        self.shots = shots if shots is not None else [8192]
+        self.backend_names = backend_names if backend_names is not None else [LOCAL_SIMULATOR]
+        self.token = token
+        self.launcher_kwargs = launcher_kwargs
+
+    def points(self):
+        """
+        :return: list of SweepPoint, the grid in order of records of run()
+        """
+        return [SweepPoint(*point) for point in product(self.channel_classes, self.masks,
+                                                        self.shots, self.backend_names)]
+
+    def run(self, progress=True, count_chunks=False):
+        """
+        :param progress: bool. Print the number of finished chunks of every backend
+        :return: list of records (dict), one per point of the grid: channel, mask, shots,
+        backend, system_qubits, rho (experiment), theory_rho and fidelity (None if the channel
+        doesn't have a theory). All records have the same keys, so it's a table.
+        """
+        points = self.points()
+        backend_points = defaultdict(list)
+        for i, point in enumerate(points):
+            backend_points[point.backend_name].append(i)
+
+        records = [None] * len(points)
+        for number, (backend_name, indexes) in enumerate(backend_points.items()):
+            if progress:
+                print(f'backend {number + 1}/{len(backend_points)}: {backend_name}, '
+                      f'points: {len(indexes)}')
+            launcher = Launcher(self.token, backend_name, **self.launcher_kwargs)
+            channels = [points[i].channel_class(backend_name=backend_name, mask=points[i].mask)
+                        for i in indexes]
+            matrices = launcher.run_batch(
+                [(channel, channel.system_qubits, points[i].shots)
+                 for i, channel in zip(indexes, channels)],
+                count_chunks=count_chunks,
+                progress=self._print_progress if progress else None
+            )
+            for i, channel, rho in zip(indexes, channels, matrices):
+                records[i] = self._record(points[i], channel, rho)
+        return records
+
+    @staticmethod
+    def _print_progress(finished, total):
+        print(f'chunks: {finished}/{total}')
+
+    @staticmethod
+    def _record(point, channel, rho):
+        dim = channel.theory_dim
+        state = rho[:dim, :dim]/np.trace(rho[:dim, :dim])
+        initial_state = np.zeros((dim, dim), dtype=complex)
+        initial_state[0, 0] = 1
+        try:
+            theory_rho = channel.get_theory_channel(**channel.channel_parameters)(initial_state)
+        except NotImplementedError:
+            theory_rho = None
+        return {
+            'channel': point.channel_class.__name__,
+            'mask': point.mask,
+            'shots': point.shots,
+            'backend': point.backend_name,
+            'system_qubits': channel.system_qubits,
+            'rho': rho,
+            'theory_rho': theory_rho,
+            'fidelity': None if theory_rho is None else fidelity(state, theory_rho)
+        }
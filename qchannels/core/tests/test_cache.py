@@ -0,0 +1,152 @@
+from unittest import TestCase
+from unittest.mock import patch
+from types import SimpleNamespace
+from math import pi
+import os
+import time
+import tempfile
+import numpy as np
+from qiskit import QuantumRegister, QuantumCircuit
+from qiskit.circuit import Parameter
+from qchannels.core.launcher import Launcher
+from qchannels.channels import BitFlipCircuit
+from qchannels.core.cache import ResultCache, TranspileCache
+from qchannels.core.tools import LOCAL_SIMULATOR, get_backend, circuit_hash
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_and_set(self):
+        cache = ResultCache(self.directory.name)
+        key = cache.make_key('circuit_hash', 'qasm_simulator', 1024, None)
+        self.assertIsNone(cache.get(key))
+        self.assertNotIn(key, cache)
+
+        cache.set(key, {'00': 1000, '11': 24})
+        self.assertIn(key, cache)
+        self.assertEqual(cache.get(key), {'00': 1000, '11': 24})
+
+        # It's persistent
+        self.assertEqual(ResultCache(self.directory.name).get(key), {'00': 1000, '11': 24})
+
+        other_key = cache.make_key('circuit_hash', 'qasm_simulator', 2048, None)
+        self.assertNotEqual(key, other_key)
+        self.assertEqual(cache.get_many([other_key, key]), [None, {'00': 1000, '11': 24}])
+
+    def test_lru_eviction(self):
+        cache = ResultCache(self.directory.name)
+        keys = [cache.make_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.set(key, {'0': i})
+            # mtime is used for LRU
+            past = time.time() - 100 + i
+            os.utime(cache._path(key), (past, past))
+        entry_size = os.path.getsize(cache._path(keys[0]))
+
+        cache.get(keys[0])  # keys[1] is the least recently used entry now
+        cache.max_size = 3 * entry_size
+        cache.set(cache.make_key(3), {'0': 3})
+
+        self.assertNotIn(keys[1], cache)
+        for key in [keys[0], keys[2], cache.make_key(3)]:
+            self.assertIn(key, cache)
+
+    def test_circuit_hash_ignores_names(self):
+        circuits = []
+        for name in ['first', 'second']:
+            qr = QuantumRegister(2, name=f'q_{name}')
+            circuit = QuantumCircuit(qr, name=name)
+            circuit.h(qr[0])
+            circuit.cx(qr[0], qr[1])
+            circuits.append(circuit)
+        self.assertEqual(circuit_hash(circuits[0]), circuit_hash(circuits[1]))
+
+        circuits[1].x(circuits[1].qregs[0][1])
+        self.assertNotEqual(circuit_hash(circuits[0]), circuit_hash(circuits[1]))
+
+    def test_launcher_run_twice(self):
+        qr = QuantumRegister(2)
+        circuit, copy = QuantumCircuit(qr), QuantumCircuit(qr)
+        for qc in [circuit, copy]:
+            qc.h(qr[0])
+            qc.cx(qr[0], qr[1])
+
+        launcher = Launcher(backend_name=LOCAL_SIMULATOR, shots=1024, seed=42,
+                            cache=ResultCache(self.directory.name), deduplicate=True)
+        expected = launcher.run([circuit, copy], [0, 1])
+        self.assertEqual(launcher.saved_experiments, 9)
+        self.assertEqual(len(os.listdir(self.directory.name)), 9)
+
+        # All counts are in the cache, nothing is executed
+        with patch.object(launcher, '_execute_chunk') as execute_chunk:
+            matrices = launcher.run([circuit, copy], [0, 1])
+        execute_chunk.assert_not_called()
+        self.assertEqual(launcher.saved_experiments, 9)
+        for rho, cached_rho in zip(expected, matrices):
+            np.testing.assert_array_equal(rho, cached_rho)
+
+        with patch.object(launcher, '_execute_chunk', return_value=[{'00': 1024}] * 9) \
+                as execute_chunk:
+            launcher.run([circuit], [0, 1], use_cache=False)
+        execute_chunk.assert_called_once()
+
+
+class TestTranspileCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_and_set(self):
+        qr = QuantumRegister(2)
+        circuit = QuantumCircuit(qr)
+        circuit.h(qr[0])
+        circuit.cx(qr[0], qr[1])
+
+        cache = TranspileCache(self.directory.name)
+        fingerprint = cache.configuration_fingerprint(get_backend(LOCAL_SIMULATOR))
+        key = cache.key(circuit, fingerprint, optimization_level=1)
+        self.assertEqual(key, cache.key(circuit_hash(circuit), fingerprint, 1))
+        self.assertNotEqual(key, cache.key(circuit, fingerprint, 2))
+        self.assertNotEqual(key, cache.key(circuit, fingerprint[:-1] + ['other version'], 1))
+
+        cache.set(key, circuit)
+        self.assertEqual(circuit_hash(TranspileCache(self.directory.name).get(key)),
+                         circuit_hash(circuit))
+
+        with open(cache._path(key), 'wb') as f:
+            f.write(b'broken entry')
+        self.assertIsNone(cache.get(key))
+
+    def test_calibrations_are_in_fingerprint_from_level_2(self):
+        backend = get_backend(LOCAL_SIMULATOR)
+        fingerprint = TranspileCache.configuration_fingerprint(backend)
+        self.assertEqual(TranspileCache.configuration_fingerprint(backend, 1), fingerprint)
+
+        calibrations = [SimpleNamespace(last_update_date=f'2019-06-0{day}T10:00:00Z')
+                        for day in [1, 2]]
+        with patch.object(backend, 'properties', side_effect=calibrations):
+            first = TranspileCache.configuration_fingerprint(backend, 2)
+            second = TranspileCache.configuration_fingerprint(backend, 2)
+        self.assertEqual(first[:-1], fingerprint)
+        self.assertNotEqual(first, second)
+
+    def test_launcher_binds_cached_parameterized_circuits(self):
+        theta = Parameter('theta')
+        circuits = [BitFlipCircuit(parameters={'theta': theta}), BitFlipCircuit()]
+        parameter_binds = [{theta: value} for value in [0, pi/3]]
+
+        launcher = Launcher(backend_name=LOCAL_SIMULATOR, shots=1024, seed=42,
+                            transpile_cache=TranspileCache(self.directory.name))
+        expected = launcher.run(circuits, [0], parameter_binds=parameter_binds)
+        with patch('qchannels.core.launcher.transpile') as transpile:
+            matrices = launcher.run(circuits, [0], parameter_binds=parameter_binds)
+        transpile.assert_not_called()
+        for rho, cached_rho in zip(expected, matrices):
+            np.testing.assert_array_equal(rho, cached_rho)
@@ -0,0 +1,89 @@
+from unittest import TestCase
+from unittest.mock import patch
+from math import pi, sin
+import numpy as np
+from qiskit.circuit import Parameter
+from qiskit.compiler import transpile
+from qchannels.channels import LandauStreaterCircuit, BitFlipCircuit
+from qchannels.core.launcher import Launcher
+from qchannels.core.theory import get_theory_choi_matrix
+
+
+class TestTemplates(TestCase):
+    def assertSameGates(self, first, second):
+        self.assertEqual(
+            [(instruction.name, instruction.params, [index for _, index in qargs])
+             for instruction, qargs, _ in first.data],
+            [(instruction.name, instruction.params, [index for _, index in qargs])
+             for instruction, qargs, _ in second.data]
+        )
+
+    def test_template_is_reused(self):
+        mask = {0: 4, 1: 3, 2: 2, 3: 1}
+        first = LandauStreaterCircuit(mask=mask)
+        with patch.object(LandauStreaterCircuit, 'create_circuit') as create_circuit:
+            second = LandauStreaterCircuit(mask=mask)
+        create_circuit.assert_not_called()
+        self.assertSameGates(first, second)
+        self.assertTrue(all(reg is second.qr for _, qargs, _ in second.data for reg, _ in qargs))
+
+    def test_coupling_map_is_a_part_of_key(self):
+        direct = LandauStreaterCircuit()
+        reversed_cnot = LandauStreaterCircuit(
+            coupling_map=[[2, 3], [0, 2], [0, 1], [1, 2], [2, 1], [1, 0]]
+        )
+        self.assertGreater(len(reversed_cnot.data), len(direct.data))
+
+
+class TestChoi(TestCase):
+    def test_added_gates_change_choi_matrix(self):
+        parameters = {'theta': pi/3}
+        expected = get_theory_choi_matrix(BitFlipCircuit, 2, **parameters)
+        modified = BitFlipCircuit(parameters=parameters)
+        modified.x(modified.qr[modified.system_qubits[0]])
+        self.assertGreater(np.abs(modified.to_choi() - expected).max(), 0.1)
+
+        # The Choi matrix of the modified circuit isn't returned for clean instances
+        self.assertAlmostEqual(
+            np.abs(BitFlipCircuit(parameters=parameters).to_choi() - expected).max(), 0
+        )
+
+
+class TestParameters(TestCase):
+    def test_bit_flip_family(self):
+        theta = Parameter('theta')
+        channel = BitFlipCircuit(parameters={'theta': theta})
+        self.assertEqual(channel.parameters, {theta})
+
+        values = [0, pi/3, pi/2, pi]
+        matrices = Launcher(backend_name='qasm_simulator', exact=True).run(
+            channel, [0], parameter_binds=[{theta: value} for value in values]
+        )
+        for value, rho in zip(values, matrices):
+            self.assertAlmostEqual(np.abs(rho - np.diag([1 - sin(value/2)**2,
+                                                         sin(value/2)**2])).max(), 0)
+
+            bound = channel.bind_parameters({theta: value})
+            self.assertEqual(bound.channel_parameters, {'theta': value})
+            self.assertAlmostEqual(np.abs(bound.to_choi() - get_theory_choi_matrix(
+                BitFlipCircuit, 2, **bound.channel_parameters
+            )).max(), 0)
+
+    def test_sampled_family_with_circuit_without_parameters(self):
+        theta = Parameter('theta')
+        circuits = [BitFlipCircuit(parameters={'theta': theta}), BitFlipCircuit()]
+        values = [0, pi/3, pi]
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=8192, seed=42)
+        with patch('qchannels.core.launcher.transpile', wraps=transpile) as transpile_mock:
+            matrices = launcher.run(circuits, [0],
+                                    parameter_binds=[{theta: value} for value in values])
+        # Tomography circuits are transpiled once, binds are applied to transpiled circuits
+        transpile_mock.assert_called_once()
+        self.assertEqual(len(matrices), len(circuits) * len(values))
+
+        for k, value in enumerate(values):
+            # BitFlipCircuit() flips with probability 1/2 for every bind
+            for rho, probability in zip(matrices[k*len(circuits):(k + 1)*len(circuits)],
+                                        [sin(value/2)**2, 0.5]):
+                self.assertAlmostEqual(np.real(rho[1, 1]), probability, delta=0.03)
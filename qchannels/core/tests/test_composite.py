@@ -0,0 +1,52 @@
+from unittest import TestCase
+import numpy as np
+from qiskit import QuantumRegister
+from qchannels.channels import LandauStreaterCircuit, WernerHolevoCircuit, CompositeChannel
+from qchannels.core.theory import get_qutrit_density_matrix_basis, create_choi_matrix_from_channel
+from qchannels.core.simulator import choi_matrix
+
+
+class TestCompositeChannel(TestCase):
+    def assertNumpyArrayAlmostEqual(self, first, second, *args, **kwargs):
+        self.assertAlmostEqual(np.sum(np.abs(first - second)), 0, *args, **kwargs)
+
+    def test_composition(self):
+        qr = QuantumRegister(6)
+        landau_streater = LandauStreaterCircuit(q_reg=qr)
+        werner_holevo = WernerHolevoCircuit(q_reg=qr, mask={1: 4, 2: 5})
+        composite = landau_streater(werner_holevo)
+        self.assertIsInstance(composite, CompositeChannel)
+        self.assertEqual(composite.system_qubits, [0, 3])
+
+        theory_channel = composite.get_theory_channel()
+        basis = get_qutrit_density_matrix_basis()
+        self.assertNumpyArrayAlmostEqual(
+            theory_channel(basis),
+            landau_streater.get_theory_channel()(werner_holevo.get_theory_channel()(basis))
+        )
+        # Gates of the concatenated circuit implement the same channel
+        self.assertNumpyArrayAlmostEqual(
+            choi_matrix(composite.to_circuit(), composite.system_qubits, dim=3),
+            create_choi_matrix_from_channel(theory_channel)
+        )
+
+        with self.assertRaises(ValueError):
+            landau_streater(LandauStreaterCircuit(q_reg=qr))  # the environment is reused
+
+    def test_tensor_product(self):
+        qr = QuantumRegister(8)
+        landau_streater = LandauStreaterCircuit(q_reg=qr)
+        werner_holevo = WernerHolevoCircuit(q_reg=qr, mask={0: 4, 1: 5, 2: 6, 3: 7})
+        composite = landau_streater * werner_holevo
+        self.assertEqual(composite.theory_dim, 9)
+
+        basis = get_qutrit_density_matrix_basis()
+        for rho1, rho2 in [(basis[0], basis[4]), (basis[8], basis[5])]:
+            self.assertNumpyArrayAlmostEqual(
+                composite.get_theory_channel()(np.kron(rho1, rho2)),
+                np.kron(landau_streater.get_theory_channel()(rho1),
+                        werner_holevo.get_theory_channel()(rho2))
+            )
+
+        with self.assertRaises(ValueError):
+            landau_streater * landau_streater
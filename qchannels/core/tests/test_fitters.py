@@ -0,0 +1,90 @@
+from unittest import TestCase
+import numpy as np
+from functools import reduce
+from itertools import product
+from qchannels.core.fitters import LinearInversionFitter, project_to_density_matrices
+
+
+class TestLinearInversionFitter(TestCase):
+    def assertNumpyArrayAlmostEqual(self, first, second, *args, **kwargs):
+        self.assertAlmostEqual(np.sum(np.abs(first - second)), 0, *args, **kwargs)
+
+    @staticmethod
+    def random_density_matrix(dim, seed):
+        rng = np.random.RandomState(seed)
+        a = rng.normal(size=(dim, dim)) + 1j*rng.normal(size=(dim, dim))
+        rho = a@np.conj(a.T)
+        return rho/np.trace(rho)
+
+    @staticmethod
+    def tomography_counts(rho, num_qubits, shots=8192):
+        """
+        Expected counts of Pauli tomography circuits: X is measured after H, Y after Sdg and H
+        """
+        h = np.array([[1, 1], [1, -1]])/np.sqrt(2)
+        rotations = {'X': h, 'Y': h@np.diag([1, -1j]), 'Z': np.eye(2)}
+        labels, counts = [], []
+        for label in product('XYZ', repeat=num_qubits):
+            rotation = reduce(np.kron, [rotations[basis] for basis in reversed(label)])
+            probabilities = np.real(np.diag(rotation@rho@np.conj(rotation.T)))
+            labels.append(str(label))
+            counts.append({format(outcome, f'0{num_qubits}b'): shots*probability
+                           for outcome, probability in enumerate(probabilities)})
+        return labels, counts
+
+    def test_fit(self):
+        for num_qubits in [1, 2, 3]:
+            fitter = LinearInversionFitter(num_qubits)
+            matrices = [self.random_density_matrix(2**num_qubits, seed) for seed in range(3)]
+            data = [self.tomography_counts(rho, num_qubits) for rho in matrices]
+
+            fitted = fitter.fit_counts([labels for labels, _ in data],
+                                       [counts for _, counts in data], physical=False)
+            self.assertEqual(fitted.shape, (3, 2**num_qubits, 2**num_qubits))
+            for rho, fitted_rho in zip(matrices, fitted):
+                self.assertNumpyArrayAlmostEqual(rho, fitted_rho)
+
+            # Physical matrices don't change after projection
+            fitted = fitter.fit_counts([labels for labels, _ in data],
+                                       [counts for _, counts in data])
+            for rho, fitted_rho in zip(matrices, fitted):
+                self.assertNumpyArrayAlmostEqual(rho, fitted_rho)
+
+    def test_project_to_density_matrices(self):
+        matrices = np.array([
+            np.diag([1.2, -0.2, 0, 0]),
+            np.diag([0.6, 0.6, -0.1, -0.1]),
+            np.eye(4)/4
+        ], dtype=complex)
+        projected = project_to_density_matrices(matrices)
+        self.assertNumpyArrayAlmostEqual(projected[0], np.diag([1, 0, 0, 0]))
+        self.assertNumpyArrayAlmostEqual(projected[1], np.diag([0.5, 0.5, 0, 0]))
+        self.assertNumpyArrayAlmostEqual(projected[2], np.eye(4)/4)
+
+
+class TestLauncherWithLinearFitter(TestCase):
+    def test_run_with_unsorted_meas_qubits(self):
+        from qiskit import QuantumRegister, QuantumCircuit
+        from qchannels.core.launcher import Launcher, LINEAR_FITTER, QISKIT_FITTER
+        from qchannels.core.theory import fidelity
+
+        # States of qubits differ, so a wrong order of qubits is noticed
+        qr = QuantumRegister(3)
+        circuit = QuantumCircuit(qr)
+        circuit.ry(1.2, qr[0])
+        circuit.cx(qr[0], qr[1])
+        circuit.x(qr[2])
+        circuit.rx(0.4, qr[2])
+        meas_qubits = [2, 1, 0]
+
+        exact = Launcher(backend_name='qasm_simulator', exact=True).run(circuit, meas_qubits)[0]
+        kwargs = {'backend_name': 'qasm_simulator', 'shots': 8192, 'seed': 42}
+        linear = Launcher(fitter=LINEAR_FITTER, **kwargs)
+        matrices = [
+            linear.run(circuit, meas_qubits)[0],
+            next(linear.run_iter([circuit], meas_qubits))[1],
+            Launcher(fitter=QISKIT_FITTER, **kwargs).run(circuit, meas_qubits)[0]
+        ]
+        np.testing.assert_array_almost_equal(matrices[0], matrices[1])
+        for rho in matrices:
+            self.assertGreater(fidelity(exact, rho), 0.98)
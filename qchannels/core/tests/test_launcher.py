@@ -0,0 +1,228 @@
+from unittest import TestCase
+from unittest.mock import patch
+import time
+import asyncio
+import numpy as np
+from functools import reduce
+from qchannels.core.launcher import sort_list_and_permutation, permute_density_matrix
+from qchannels.core.launcher import sort_list_and_transformation_matrix
+
+
+class TestQubitsOrder(TestCase):
+    def assertNumpyArrayAlmostEqual(self, first, second, *args, **kwargs):
+        self.assertAlmostEqual(np.sum(np.abs(first - second)), 0, *args, **kwargs)
+
+    @staticmethod
+    def random_density_matrix(dim, seed):
+        rng = np.random.RandomState(seed)
+        a = rng.normal(size=(dim, dim)) + 1j*rng.normal(size=(dim, dim))
+        rho = a@np.conj(a.T)
+        return rho/np.trace(rho)
+
+    @staticmethod
+    def little_endian_kron(matrices):
+        # The first qubit in the list is the least significant bit
+        return reduce(np.kron, reversed(matrices))
+
+    def test_permute_density_matrix(self):
+        states = {qubit: self.random_density_matrix(2, qubit) for qubit in [1, 4, 6, 9]}
+        for meas_qubits in [[4], [6, 1], [1, 6], [9, 1, 6], [6, 9, 4, 1], [4, 1, 9, 6]]:
+            sorted_qubits, axes = sort_list_and_permutation(meas_qubits)
+            self.assertEqual(sorted_qubits, sorted(meas_qubits))
+
+            rho_sorted = self.little_endian_kron([states[qubit] for qubit in sorted_qubits])
+            self.assertNumpyArrayAlmostEqual(
+                permute_density_matrix(rho_sorted, axes),
+                self.little_endian_kron([states[qubit] for qubit in meas_qubits])
+            )
+
+    def test_permute_stack_of_density_matrices(self):
+        meas_qubits = [5, 0, 3]
+        _, axes = sort_list_and_permutation(meas_qubits)
+        stack = np.array([self.random_density_matrix(8, seed) for seed in range(4)])
+        permuted = permute_density_matrix(stack, axes)
+        for rho, permuted_rho in zip(stack, permuted):
+            self.assertNumpyArrayAlmostEqual(permute_density_matrix(rho, axes), permuted_rho)
+
+    def test_transformation_matrix(self):
+        for meas_qubits in [[2, 0], [3, 1, 2], [7, 5, 6, 4]]:
+            sorted_qubits, s_matrix = sort_list_and_transformation_matrix(meas_qubits)
+            _, axes = sort_list_and_permutation(meas_qubits)
+            self.assertEqual(sorted_qubits, sorted(meas_qubits))
+
+            rho = self.random_density_matrix(2**len(meas_qubits), len(meas_qubits))
+            self.assertNumpyArrayAlmostEqual(
+                np.linalg.inv(s_matrix) @ rho @ s_matrix,
+                permute_density_matrix(rho, axes)
+            )
+
+
+class TestDeduplication(TestCase):
+    def test_identical_experiments_are_executed_once(self):
+        from qiskit import QuantumRegister, QuantumCircuit
+        from qchannels.core.launcher import Launcher
+
+        qr = QuantumRegister(2)
+        first, second = QuantumCircuit(qr), QuantumCircuit(qr)
+        first.h(qr[0])
+        second.h(qr[0])
+        other = QuantumCircuit(qr)
+        other.x(qr[1])
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=1024, seed=42,
+                            deduplicate=True, combine_shots=True)
+        jobs, _, _ = launcher._prepare_jobs([first, other, second], [0, 1])
+        plan = launcher._plan(jobs)
+        self.assertEqual(plan.saved_experiments, 9)
+        self.assertEqual(plan.owners[18:], plan.owners[:9])
+        self.assertEqual(plan.shots[:9], [2048] * 9)
+
+        matrices = launcher.run([first, other, second], [0, 1])
+        self.assertEqual(launcher.saved_experiments, 9)
+        np.testing.assert_array_equal(matrices[0], matrices[2])
+
+
+def bell_circuits():
+    from qiskit import QuantumRegister, QuantumCircuit
+
+    qr = QuantumRegister(2)
+    circuits = []
+    for gate in ['h', 'x', 'y']:
+        circuit = QuantumCircuit(qr)
+        getattr(circuit, gate)(qr[0])
+        circuit.h(qr[1])
+        circuit.cx(qr[0], qr[1])
+        circuits.append(circuit)
+    return circuits
+
+
+class TestConcurrency(TestCase):
+    def test_concurrent_chunks_keep_order(self):
+        from qchannels.core.launcher import Launcher
+
+        serial = Launcher(backend_name='qasm_simulator', shots=1024, seed=42)
+        serial.max_experiments = 4  # 27 experiments are executed in 7 chunks
+        expected = serial.run(bell_circuits(), [0, 1])
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=1024, seed=42,
+                            max_concurrent_jobs=4)
+        launcher.max_experiments = 4
+        execute_chunk = launcher._execute_chunk
+
+        def reversed_execute_chunk(number, *args, **kwargs):
+            # The first chunks are finished last
+            time.sleep(0.05 * (7 - number))
+            return execute_chunk(number, *args, **kwargs)
+
+        with patch.object(launcher, '_execute_chunk', side_effect=reversed_execute_chunk):
+            matrices = launcher.run(bell_circuits(), [0, 1])
+            async_matrices = asyncio.run(launcher.run_async(bell_circuits(), [0, 1]))
+        for rho, concurrent_rho, async_rho in zip(expected, matrices, async_matrices):
+            np.testing.assert_array_equal(rho, concurrent_rho)
+            np.testing.assert_array_equal(rho, async_rho)
+
+    def test_parallel_fit_is_identical_to_serial(self):
+        from qchannels.core.launcher import Launcher
+
+        expected = Launcher(backend_name='qasm_simulator', shots=1024, seed=42).run(
+            bell_circuits(), [1, 0]
+        )
+        matrices = Launcher(backend_name='qasm_simulator', shots=1024, seed=42,
+                            fit_workers=2).run(bell_circuits(), [1, 0])
+        self.assertEqual(len(matrices), len(expected))
+        for rho, parallel_rho in zip(expected, matrices):
+            np.testing.assert_array_equal(rho, parallel_rho)
+
+
+class TestStreaming(TestCase):
+    def test_run_iter_matches_run(self):
+        from qchannels.core.launcher import Launcher
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=1024, seed=42)
+        expected = launcher.run(bell_circuits(), [1, 0])
+
+        taken = []
+
+        def circuits():
+            for circuit in bell_circuits():
+                taken.append(circuit)
+                yield circuit
+
+        # 9 tomography circuits of two qubits, so every chunk is one circuit
+        results = launcher.run_iter(circuits(), [1, 0], chunk_size=9)
+        self.assertEqual(next(results)[0], 0)
+        self.assertEqual(len(taken), 1)
+
+        results = list(launcher.run_iter(circuits(), [1, 0], chunk_size=4))
+        self.assertEqual([i for i, _ in results], list(range(len(expected))))
+        for rho, (_, streamed_rho) in zip(expected, results):
+            np.testing.assert_array_equal(rho, streamed_rho)
+
+    def test_empty_input(self):
+        from qchannels.core.launcher import Launcher
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=1024)
+        self.assertEqual(launcher.run([], [0, 1]), [])
+        self.assertEqual(list(launcher.run_iter([], [0, 1])), [])
+
+
+class TestSplitShots(TestCase):
+    def test_parts_are_different_samples(self):
+        from qiskit import QuantumRegister, QuantumCircuit
+        from qiskit.compiler import assemble
+        from qchannels.core.launcher import Launcher
+
+        qr = QuantumRegister(1)
+        circuit = QuantumCircuit(qr)
+        circuit.rx(1.0, qr[0])  # no basis of tomography gives a deterministic outcome
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=2048, seed=42)
+        launcher.max_shots = 512
+        jobs, _, _ = launcher._prepare_jobs([circuit], [0])
+        plan = launcher._plan(jobs)
+        self.assertEqual(plan.parts, [0, 1, 2, 3])
+
+        with patch('qchannels.core.launcher.assemble', wraps=assemble) as assemble_mock:
+            results = [launcher._execute_chunk(i, task_jobs, shots, part)
+                       for i, ((shots, _), task_jobs, part)
+                       in enumerate(zip(plan.tasks, plan.tasks_jobs(), plan.parts))]
+        self.assertEqual([call[1]['seed_simulator'] for call in assemble_mock.call_args_list],
+                         [42, 43, 44, 45])
+
+        counts = plan.collect(results)
+        for job_counts, parts_counts in zip(counts, zip(*results)):
+            self.assertEqual(sum(job_counts.values()), 2048)
+            # Parts are different samples, not copies of the same 512 samples
+            self.assertGreater(len(set(map(str, parts_counts))), 1)
+
+        rho = launcher.run([circuit], [0])[0]
+        self.assertAlmostEqual(np.real(rho[0, 0]), np.cos(0.5)**2, delta=0.05)
+
+
+class TestCompositeChannel(TestCase):
+    def test_run_composite_channel(self):
+        from math import pi
+        from qiskit import QuantumRegister
+        from qchannels.channels import BitFlipCircuit
+        from qchannels.core.launcher import Launcher
+        from qchannels.core.theory import fidelity
+
+        qr = QuantumRegister(3)
+        first = BitFlipCircuit(q_reg=qr, parameters={'theta': pi/3})
+        second = BitFlipCircuit(q_reg=qr, mask={1: 2}, parameters={'theta': pi/3})
+        composite = first(second)
+        # Two flips with probability 1/4
+        expected = composite.get_theory_channel()(np.diag([1, 0]).astype(complex))
+        np.testing.assert_array_almost_equal(expected, np.diag([5/8, 3/8]))
+
+        launcher = Launcher(backend_name='qasm_simulator', shots=8192, seed=42)
+        matrices = [
+            launcher.run(composite, composite.system_qubits)[0],
+            asyncio.run(launcher.run_async(composite, composite.system_qubits))[0],
+            next(launcher.run_iter([composite], composite.system_qubits))[1],
+            Launcher(backend_name='qasm_simulator', exact=True).run(
+                composite, composite.system_qubits
+            )[0]
+        ]
+        for rho in matrices:
+            self.assertGreater(fidelity(expected, rho), 0.99)
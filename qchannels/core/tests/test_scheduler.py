@@ -0,0 +1,46 @@
+from unittest import TestCase
+from qchannels.core.scheduler import split_shots, pack_experiments, part_indexes, merge_counts
+
+
+class TestScheduler(TestCase):
+    def test_split_shots(self):
+        self.assertEqual(split_shots(100), [100])
+        self.assertEqual(split_shots(100, 100), [100])
+        self.assertEqual(split_shots(250, 100), [100, 100, 50])
+
+    def test_pack_experiments(self):
+        tasks = pack_experiments({i: 10 for i in range(7)}, max_experiments=3)
+        self.assertEqual(tasks, [(10, [0, 1, 2]), (10, [3, 4, 5]), (10, [6])])
+
+        # Experiments with different shots are in different jobs
+        tasks = pack_experiments({0: 10, 1: 20, 2: 10}, max_experiments=3)
+        self.assertEqual(sorted(tasks), [(10, [0, 2]), (20, [1])])
+
+    def test_pack_experiments_with_split_shots(self):
+        tasks = pack_experiments({0: 250, 1: 200}, max_experiments=5, max_shots=100)
+        self.assertEqual(sorted(tasks), [(50, [0]), (100, [0, 1]), (100, [0, 1])])
+
+        shots = {0: 0, 1: 0}
+        for task_shots, experiments in tasks:
+            self.assertLessEqual(len(experiments), 5)
+            self.assertEqual(len(set(experiments)), len(experiments))
+            for experiment in experiments:
+                shots[experiment] += task_shots
+        self.assertEqual(shots, {0: 250, 1: 200})
+
+    def test_part_indexes(self):
+        tasks = pack_experiments({0: 250, 1: 200, 2: 150, 3: 50}, max_experiments=2,
+                                 max_shots=100)
+        parts = part_indexes(tasks)
+        self.assertEqual(parts, [0, 0, 0, 1, 1, 2])
+
+        # Every task has the same part of all its experiments
+        experiment_parts = {}
+        for (_, experiments), part in zip(tasks, parts):
+            for experiment in experiments:
+                experiment_parts.setdefault(experiment, []).append(part)
+        self.assertEqual(experiment_parts, {0: [0, 1, 2], 1: [0, 1], 2: [0, 1], 3: [0]})
+
+    def test_merge_counts(self):
+        self.assertEqual(merge_counts({'00': 3, '11': 1}, {'11': 2, '01': 1}),
+                         {'00': 3, '11': 3, '01': 1})
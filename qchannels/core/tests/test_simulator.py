@@ -0,0 +1,73 @@
+from unittest import TestCase
+from unittest.mock import patch
+from collections import OrderedDict
+import numpy as np
+from qiskit import QuantumRegister, QuantumCircuit
+from qchannels.core.simulator import reduced_density_matrix
+from qchannels.core.theory import create_choi_matrix_from_channel
+from qchannels.channels import LandauStreaterCircuit, WernerHolevoCircuit, IdentityCircuit
+from qchannels.channels.abstract import AbstractChannelCircuit
+
+
+class TestStatevectorSimulator(TestCase):
+    def assertNumpyArrayAlmostEqual(self, first, second, *args, **kwargs):
+        self.assertAlmostEqual(np.sum(np.abs(first - second)), 0, *args, **kwargs)
+
+    def test_bell_state(self):
+        qr = QuantumRegister(3)
+        circuit = QuantumCircuit(qr)
+        circuit.h(qr[0])
+        circuit.cx(qr[0], qr[2])
+        circuit.x(qr[1])
+
+        bell = np.zeros((4, 4))
+        bell[np.ix_([0, 3], [0, 3])] = 1/2
+        self.assertNumpyArrayAlmostEqual(reduced_density_matrix(circuit, [0, 2]), bell)
+        self.assertNumpyArrayAlmostEqual(reduced_density_matrix(circuit, [0]), np.eye(2)/2)
+        # The first qubit in the list is the least significant bit
+        self.assertNumpyArrayAlmostEqual(reduced_density_matrix(circuit, [1, 0]),
+                                         np.kron(np.eye(2)/2, np.diag([0, 1])))
+
+    def test_channels(self):
+        for channel_class in [LandauStreaterCircuit, WernerHolevoCircuit]:
+            for theta, phi in [(0, 0), (np.pi/3, np.pi/5), (np.pi/2, 1)]:
+                channel = channel_class()
+                qr = channel.qr
+                circuit = QuantumCircuit(qr)
+                # (cos(theta/2)|00> + e^{i phi} sin(theta/2)|01>) on system qubits
+                circuit.u3(theta, phi, 0, qr[channel.system_qubits[0]])
+                circuit += channel
+
+                state = np.array([np.cos(theta/2), np.exp(1j*phi)*np.sin(theta/2), 0])
+                rho = reduced_density_matrix(circuit, channel.system_qubits)
+                self.assertNumpyArrayAlmostEqual(
+                    rho[:3, :3], channel.get_theory_channel()(np.outer(state, np.conj(state)))
+                )
+
+    def test_to_choi(self):
+        for channel_class in [LandauStreaterCircuit, WernerHolevoCircuit]:
+            for mask in [{}, {0: 1, 1: 2, 2: 3, 3: 0}]:
+                channel = channel_class(mask=mask)
+                self.assertNumpyArrayAlmostEqual(
+                    channel.to_choi(dim=3),
+                    create_choi_matrix_from_channel(channel.get_theory_channel())
+                )
+
+        identity = IdentityCircuit(rel_system_qubits=[0, 1])
+        self.assertNumpyArrayAlmostEqual(
+            identity.to_choi(), create_choi_matrix_from_channel(lambda rho: rho, dim=4)
+        )
+
+    def test_to_choi_is_memoized(self):
+        choi = LandauStreaterCircuit().to_choi(dim=3)
+        choi[0, 0] = 10  # a copy is returned
+        self.assertNumpyArrayAlmostEqual(LandauStreaterCircuit().to_choi(dim=3),
+                                         create_choi_matrix_from_channel(
+                                             LandauStreaterCircuit.get_theory_channel()))
+
+    def test_to_choi_memo_is_bounded(self):
+        with patch.object(AbstractChannelCircuit, 'MAX_CHOI_MATRICES', 2), \
+                patch.object(AbstractChannelCircuit, '_choi_matrices', OrderedDict()):
+            for mask in [{}, {0: 1, 1: 2, 2: 3, 3: 0}, {0: 2, 1: 3, 2: 0, 3: 1}]:
+                LandauStreaterCircuit(mask=mask).to_choi(dim=3)
+            self.assertEqual(len(AbstractChannelCircuit._choi_matrices), 2)
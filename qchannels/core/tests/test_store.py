@@ -0,0 +1,79 @@
+from unittest import TestCase
+from concurrent.futures import ProcessPoolExecutor
+import tempfile
+import numpy as np
+from qchannels.core.store import ResultStore, RHO, CHOI
+from qchannels.core.launcher import Launcher
+from qchannels.channels import LandauStreaterCircuit
+
+
+def append_matrices(directory, worker, number=20):
+    store = ResultStore(directory, script=f'worker {worker}')
+    for i in range(number):
+        store.append(RHO, np.full((4, 4), 100*worker + i, dtype=complex), name=str(i))
+    store.close()
+
+
+class TestResultStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ResultStore(self.directory.name, script='test')
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_concurrent_appends(self):
+        workers = 4
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(append_matrices, [self.directory.name] * workers, range(workers)))
+
+        records = self.store.query(kind=RHO)
+        self.assertEqual(len(records), workers * 20)
+        for record in records:
+            worker = int(record.script.split()[-1])
+            np.testing.assert_array_equal(self.store.load(record),
+                                          np.full((4, 4), 100*worker + int(record.name)))
+
+    def test_append_and_query(self):
+        rho = np.diag([0.5, 0.25, 0.25, 0]).astype(complex)
+        self.store.append(RHO, rho, counts={"('Z',)": {'0': 10}}, channel='LandauStreaterCircuit',
+                          mask={0: 4, 1: 3}, backend='qasm_simulator', shots=1024,
+                          meas_qubits=[4, 1], seed=42)
+        self.store.append_many(CHOI, [np.full((9, 9), i, dtype=complex) for i in range(3)],
+                               metadata=[{'channel': 'WernerHolevoCircuit', 'shots': 1024 * i}
+                                         for i in range(3)])
+
+        record, = self.store.query(kind=RHO)
+        self.assertEqual(record.mask, {0: 4, 1: 3})
+        self.assertEqual(record.meas_qubits, [4, 1])
+        self.assertEqual(record.script, 'test')
+        self.assertEqual(self.store.load_metadata(record), {'seed': 42})
+        self.assertEqual(self.store.load_counts(record), {"('Z',)": {'0': 10}})
+        np.testing.assert_array_equal(self.store.load(record), rho)
+
+        self.assertEqual(len(self.store.query(mask={1: 3, 0: 4})), 1)
+        self.assertEqual(len(self.store.query(channel=['LandauStreaterCircuit',
+                                                       'WernerHolevoCircuit'])), 4)
+        records = self.store.query(kind=CHOI, shots=[1024, 2048])
+        self.assertEqual(self.store.load_metadata(records[0]), {})
+        self.assertIsNone(self.store.load_counts(records[0]))
+        np.testing.assert_array_equal(self.store.load_stack(records)[:, 0, 0], [1, 2])
+
+        # It's persistent
+        self.store.close()
+        self.store = ResultStore(self.directory.name)
+        self.assertEqual(len(self.store.query()), 4)
+        with self.assertRaises(ValueError):
+            self.store.query(unknown_column=1)
+
+    def test_launcher(self):
+        mask = {0: 4, 1: 3, 2: 2, 3: 1}
+        channel = LandauStreaterCircuit(mask=mask)
+        matrices = Launcher(backend_name='qasm_simulator', exact=True, store=self.store).run(
+            [channel], channel.system_qubits
+        )
+        record, = self.store.query(channel='LandauStreaterCircuit', mask=mask)
+        self.assertEqual(record.meas_qubits, channel.system_qubits)
+        self.assertEqual(record.backend, 'qasm_simulator')
+        np.testing.assert_array_almost_equal(self.store.load(record), matrices[0])
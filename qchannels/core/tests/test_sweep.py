@@ -0,0 +1,28 @@
+from unittest import TestCase
+from qchannels.core.sweep import Sweep
+from qchannels.channels import LandauStreaterCircuit, WernerHolevoCircuit
+
+
+class TestSweep(TestCase):
+    def test_exact_sweep(self):
+        masks = [{}, {0: 4, 1: 3, 2: 2, 3: 1}]
+        sweep = Sweep([LandauStreaterCircuit, 'Werner-Holevo', 'Bit-Flip'], masks=masks,
+                      shots=[1024, 2048], exact=True)
+        records = sweep.run(progress=False)
+        self.assertEqual(len(records), 3 * 2 * 2)
+        for point, record in zip(sweep.points(), records):
+            self.assertEqual(record['channel'], point.channel_class.__name__)
+            self.assertEqual(record['shots'], point.shots)
+            self.assertAlmostEqual(record['fidelity'], 1)
+        self.assertEqual(records[-1]['system_qubits'], [4])
+        self.assertIs(sweep.points()[4].channel_class, WernerHolevoCircuit)
+
+    def test_sampled_sweep(self):
+        masks = [{}, {0: 1, 1: 0}]
+        sweep = Sweep(['Werner-Holevo', 'Bit-Flip'], masks=masks, shots=[4096, 8192], seed=42,
+                      deduplicate=True)
+        records = sweep.run(progress=False)
+        self.assertEqual(len(records), 2 * 2 * 2)
+        for point, record in zip(sweep.points(), records):
+            self.assertEqual(record['shots'], point.shots)
+            self.assertGreater(record['fidelity'], 0.95)
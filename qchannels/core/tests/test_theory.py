@@ -1,15 +1,62 @@
 from unittest import TestCase
 import numpy as np
 from qchannels.core.theory import create_channel_from_choi_matrix, partial_trace_with_halves
+from qchannels.core.theory import partial_trace, batched_channel, get_theory_choi_matrix
+from qchannels.core.theory import fidelity, fidelities, is_pure
+from qchannels.core.theory import get_density_matrix_basis, create_choi_matrix_from_tomography
 from qchannels.core.theory import get_qutrit_density_matrix_basis
 from qchannels.core.theory import create_choi_matrix_from_channel, get_kraus_operators_from_choi
 from qchannels.channels.identity import IdentityCircuit
+from qchannels.channels import LandauStreaterCircuit, WernerHolevoCircuit
 
 
 class TestTheory(TestCase):
     def assertNumpyArrayAlmostEqual(self, first, second, *args, **kwargs):
         self.assertAlmostEqual(np.sum(np.abs(first - second)), 0, *args, **kwargs)
 
+    def test_fidelity(self):
+        pure = np.diag([1, 0, 0])
+        mixed = np.diag([0.5, 0.3, 0.2])
+        self.assertAlmostEqual(fidelity(pure, mixed), 0.5)
+        self.assertAlmostEqual(fidelity(mixed, pure), 0.5)
+        self.assertAlmostEqual(fidelity(mixed, mixed), 1)
+        self.assertAlmostEqual(fidelity(mixed, np.diag([0.2, 0.3, 0.5])),
+                               (2*np.sqrt(0.1) + 0.3)**2)
+        self.assertIsInstance(fidelity(mixed, mixed), float)
+
+        # One reference and a stack of matrices
+        basis = get_qutrit_density_matrix_basis()
+        values = fidelities(mixed, basis)
+        self.assertEqual(values.shape, (9,))
+        for rho, value in zip(basis, values):
+            self.assertAlmostEqual(value, np.real(np.trace(mixed@rho)))
+        self.assertNumpyArrayAlmostEqual(fidelities(basis, basis), np.ones(9))
+
+    def test_is_pure(self):
+        state = np.array([1, 1j, 0])/np.sqrt(2)
+        pure = np.outer(state, np.conj(state))
+        self.assertTrue(is_pure(pure))
+        self.assertFalse(is_pure(np.diag([0.5, 0.3, 0.2])))
+
+        # Rank is 1, but it isn't normalized
+        self.assertFalse(is_pure(2*pure))
+        np.testing.assert_array_equal(is_pure(np.array([pure, 2*pure, np.eye(3)/3])),
+                                      [True, False, False])
+
+    def test_fidelity_with_pure_reference(self):
+        # Purity of the reference matrix is taken from its eigenvalues, so a matrix
+        # with Tr(rho^2) = Tr(rho)^2 = 1 and a negative eigenvalue isn't treated as pure
+        b, c = np.roots([1, -0.1, -0.09])
+        not_psd = np.diag([0.9, b, c])
+        self.assertAlmostEqual(np.trace(not_psd@not_psd), 1)
+        mixed = np.diag([0.5, 0.3, 0.2])
+        self.assertAlmostEqual(fidelity(not_psd, mixed),
+                               (np.sqrt(0.45) + np.sqrt(0.3*max(b, c)))**2)
+
+        state = np.array([1, 1j, 0])/np.sqrt(2)
+        pure = np.outer(state, np.conj(state))
+        np.testing.assert_allclose(fidelities(pure, np.array([mixed, pure])), [0.4, 1])
+
     def test_partial_trace(self):
         a = np.array([[1, 2], [3, 4]])
         b = np.array([[5, 6], [7, 8]])
@@ -30,6 +77,42 @@ class TestTheory(TestCase):
         self.assertAlmostEqual(np.trace(np.abs(partial_trace_with_halves(AB, 1))), 1)
         self.assertAlmostEqual(np.trace(np.abs(partial_trace_with_halves(AB, 2))), 1)
 
+        # Batch and sympy fallback
+        stack = np.array([AB, np.kron(b, a)])
+        self.assertNumpyArrayAlmostEqual(partial_trace_with_halves(stack, 1), np.array([a, b]))
+        from sympy import Matrix
+        self.assertNumpyArrayAlmostEqual(
+            np.array(partial_trace_with_halves(Matrix(AB), 2), dtype=complex), b
+        )
+
+    def test_partial_trace_of_arbitrary_subsystems(self):
+        a = np.diag([0.25, 0.75])
+        b = np.diag([0.5, 0.3, 0.2])
+        c = np.array([[0.5, 0.5j], [-0.5j, 0.5]])
+        abc = np.kron(np.kron(a, b), c)
+        self.assertNumpyArrayAlmostEqual(partial_trace(abc, [2, 3, 2], [0, 2]), b)
+        self.assertNumpyArrayAlmostEqual(partial_trace(abc, [2, 3, 2], [1]), np.kron(a, c))
+        self.assertNumpyArrayAlmostEqual(partial_trace(abc, [2, 3, 2], []), abc)
+        self.assertNumpyArrayAlmostEqual(partial_trace(np.array([abc]*3), [2, 3, 2], [0, 1]),
+                                         np.array([c]*3))
+
+    def test_batched_choi_matrix(self):
+        for channel_class in [LandauStreaterCircuit, WernerHolevoCircuit]:
+            channel = channel_class.get_theory_channel()
+            self.assertTrue(channel.batched)
+            self.assertNumpyArrayAlmostEqual(
+                create_choi_matrix_from_channel(channel),
+                create_choi_matrix_from_channel(lambda rho: channel(rho))
+            )
+            self.assertNumpyArrayAlmostEqual(get_theory_choi_matrix(channel_class),
+                                             create_choi_matrix_from_channel(channel))
+
+        X = np.array([[0, 1], [1, 0]])
+        self.assertNumpyArrayAlmostEqual(
+            create_choi_matrix_from_channel(batched_channel(lambda rho: X@rho@X), dim=2),
+            create_choi_matrix_from_channel(lambda rho: X@rho@X, dim=2)
+        )
+
     def test_create_choi_matrix_from_channel(self):
         X, Y, Z = np.array([[0, 1], [1, 0]]), np.array([[0, -1j], [1j, 0]]), np.diag([1, -1])
         self.assertNumpyArrayAlmostEqual(
@@ -112,6 +195,15 @@ class TestTheory(TestCase):
         for i, array in enumerate(b):
             self.assertNumpyArrayAlmostEqual(a[i], b[i])
 
+    def test_channel_from_choi_matrix_on_stack(self):
+        channel = WernerHolevoCircuit.get_theory_channel()
+        restored_channel = create_channel_from_choi_matrix(create_choi_matrix_from_channel(channel))
+        self.assertEqual(restored_channel.superoperator.shape, (9, 9))
+
+        basis = get_qutrit_density_matrix_basis()
+        self.assertNumpyArrayAlmostEqual(restored_channel(basis), channel(basis))
+        self.assertNumpyArrayAlmostEqual(restored_channel(basis[4]), channel(basis[4]))
+
     def test_get_kraus_operators_from_choi(self):
         CNOT = np.array([
             [1, 0, 0, 0],
@@ -155,3 +247,39 @@ class TestTheory(TestCase):
             print(krauses)
             raise
 
+    def test_get_kraus_operators_of_non_symmetric_channel(self):
+        gamma = 0.3
+        amplitude_damping = [np.diag([1, np.sqrt(1 - gamma)]),
+                             np.array([[0, np.sqrt(gamma)], [0, 0]])]
+        choi = create_choi_matrix_from_channel(
+            lambda rho: sum(k@rho@np.conj(k.T) for k in amplitude_damping), dim=2
+        )
+        original_choi = np.copy(choi)
+        self.assertKrausOperators(get_kraus_operators_from_choi(choi), amplitude_damping)
+        self.assertNumpyArrayAlmostEqual(choi, original_choi)
+
+        # Batch of Choi matrices
+        identity_choi = create_choi_matrix_from_channel(lambda rho: rho, dim=2)
+        krauses = get_kraus_operators_from_choi(np.array([choi, identity_choi]))
+        self.assertEqual(krauses.shape, (2, 2, 2, 2))
+        self.assertKrausOperators(krauses[0], amplitude_damping)
+        self.assertKrausOperators(krauses[1], [np.eye(2), np.zeros((2, 2))])
+
+    def test_create_choi_matrix_from_tomography(self):
+        for dim in [2, 3, 4]:
+            basis = get_density_matrix_basis(dim)
+            self.assertEqual(basis.shape, (dim**2, dim, dim))
+            self.assertNumpyArrayAlmostEqual(np.trace(basis, axis1=1, axis2=2), np.ones(dim**2))
+
+            shift = np.roll(np.eye(dim), 1, axis=0)
+            channel = lambda rho: shift@rho@shift.T
+            self.assertNumpyArrayAlmostEqual(
+                create_choi_matrix_from_tomography([channel(rho) for rho in basis], basis),
+                create_choi_matrix_from_channel(channel, dim=dim)
+            )
+
+        channel = WernerHolevoCircuit.get_theory_channel()
+        self.assertNumpyArrayAlmostEqual(
+            create_choi_matrix_from_tomography(channel(get_qutrit_density_matrix_basis())),
+            create_choi_matrix_from_channel(channel)
+        )
@@ -0,0 +1,44 @@
+from unittest import TestCase
+from qiskit import QuantumRegister, ClassicalRegister, QuantumCircuit
+from qiskit.ignis.verification.tomography import state_tomography_circuits
+from qchannels.core.tomography import tomography_circuits, get_tomography_suffixes
+from qchannels.core.tools import circuit_hash
+from qchannels.channels import LandauStreaterCircuit
+
+
+class TestTomographyCircuits(TestCase):
+    def assertSameCircuits(self, circuits, expected_circuits):
+        self.assertEqual(len(circuits), len(expected_circuits))
+        for circuit, expected_circuit in zip(circuits, expected_circuits):
+            self.assertEqual(circuit.name, expected_circuit.name)
+            # Names of classical registers are different
+            self.assertEqual(circuit_hash(circuit), circuit_hash(expected_circuit))
+
+    def test_tomography_circuits(self):
+        channel = LandauStreaterCircuit(mask={0: 1, 1: 2, 2: 3, 3: 0})
+        qr = channel.qregs[0]
+        for meas_qubits in [[1], [0, 1], sorted(channel.system_qubits + channel.env_qubits)]:
+            self.assertSameCircuits(
+                tomography_circuits(channel, meas_qubits),
+                state_tomography_circuits(channel, [qr[qubit] for qubit in meas_qubits])
+            )
+
+    def test_circuit_with_classical_register(self):
+        qr, cr = QuantumRegister(3), ClassicalRegister(3)
+        circuit = QuantumCircuit(qr, cr)
+        circuit.h(qr[0])
+        circuit.cx(qr[0], qr[2])
+        self.assertSameCircuits(
+            tomography_circuits(circuit, [0, 2]),
+            state_tomography_circuits(circuit, [qr[0], qr[2]])
+        )
+
+    def test_suffixes_are_reused(self):
+        qr = QuantumRegister(4)
+        first, second = QuantumCircuit(qr), QuantumCircuit(qr)
+        first.x(qr[0])
+        second.h(qr[1])
+        tomography_circuits(first, [0, 1])
+        hits = get_tomography_suffixes.cache_info().hits
+        tomography_circuits(second, [0, 1])
+        self.assertEqual(get_tomography_suffixes.cache_info().hits, hits + 1)
@@ -0,0 +1,28 @@
+from unittest import TestCase
+from qchannels.core.tools import CHANNELS, LOCAL_SIMULATOR, get_channel_class, get_backend
+from qchannels.core.tools import get_coupling_graph
+from qchannels.channels.abstract import AbstractChannelCircuit
+
+
+class TestRegistry(TestCase):
+    def test_channels(self):
+        for name in CHANNELS:
+            channel_class = get_channel_class(name)
+            self.assertTrue(issubclass(channel_class, AbstractChannelCircuit))
+            self.assertEqual(channel_class.__name__, name.replace('-', '') + 'Circuit')
+
+    def test_backends(self):
+        self.assertEqual(get_backend(LOCAL_SIMULATOR).name(), LOCAL_SIMULATOR)
+        with self.assertRaises(ValueError):
+            get_backend('unknown_backend')
+
+
+class TestCouplingGraph(TestCase):
+    def test_edges(self):
+        graph = get_coupling_graph([[0, 1], [1, 2], [0, 2]])
+        self.assertTrue(graph.has_edge(0, 1))
+        self.assertFalse(graph.has_edge(1, 0))
+        self.assertEqual(graph.neighbors(0), {1, 2})
+        self.assertEqual(graph.neighbors(2), set())
+        self.assertIs(get_coupling_graph(((0, 1), (1, 2), (0, 2))), graph)
+        self.assertIsNone(get_coupling_graph(None))
@@ -2,9 +2,9 @@
 # -*- coding: utf-8 -*-
 
 
-from scipy.linalg import sqrtm
+from functools import lru_cache
+
 import numpy as np
-from cmath import sqrt
 
 DIM = 3
 
@@ -33,35 +33,135 @@ def get_density_matrix_from_state(state):
     return state@np.transpose(np.conj(state))
 
 
+@lru_cache(maxsize=None)
+def _get_density_matrix_basis(dim):
+    states = np.eye(dim, dtype=complex)
+    pairs = [(a, b) for a in range(dim) for b in range(a + 1, dim)]
+    first, second = np.array(pairs, dtype=int).reshape(-1, 2).T
+    basis_states = np.concatenate([
+        states,
+        (states[first] + states[second])/np.sqrt(2),
+        (states[first] + 1j*states[second])/np.sqrt(2)
+    ])
+    basis = basis_states[:, :, None] * np.conj(basis_states[:, None, :])
+    basis.flags.writeable = False
+    return basis
+
+
+def get_density_matrix_basis(dim=DIM):
+    """
+    dim**2 density matrices that span all matrices: |a><a|, then (|a> + |b>)/sqrt(2)
+    and (|a> + i|b>)/sqrt(2) for a < b
+    :return: np.array(dim**2, dim, dim)
+    >>> get_density_matrix_basis(4).shape
+    (16, 4, 4)
+    """
+    return np.array(_get_density_matrix_basis(dim))
+
+
 def get_qutrit_density_matrix_basis():
-    basis_states = np.array(
-        [get_state(a) for a in [0b00, 0b01, 0b10]] +
-        [(get_state(a) + get_state(b)) / np.sqrt(2) for a, b in [(0b00, 0b01), (0b00, 0b10), (0b01, 0b10)]] +
-        [(get_state(a) + 1j * get_state(b)) / np.sqrt(2) for a, b in [(0b00, 0b01), (0b00, 0b10), (0b01, 0b10)]]
-    )
-    return np.array(
-        [state@np.transpose(np.conj(state)) for state in basis_states]
-    )
+    return get_density_matrix_basis(3)
+
+
+FIDELITY_TOLERANCE = 1e-10
+
+
+def _matrix_sqrt_and_eigenvalues(rho, tol=FIDELITY_TOLERANCE):
+    eigenvalues, eigenvectors = np.linalg.eigh(rho)
+    roots = np.sqrt(np.where(eigenvalues > tol, eigenvalues, 0))
+    sqrt_rho = (eigenvectors * roots[..., None, :]) @ np.conj(np.swapaxes(eigenvectors, -1, -2))
+    return sqrt_rho, eigenvalues
+
+
+def matrix_sqrt(rho, tol=FIDELITY_TOLERANCE):
+    """
+    Square root of hermitian positive semidefinite matrices by eigendecomposition.
+    Eigenvalues smaller than tol (they appear because of rounding errors) are set to zero.
+    :param rho: np.array(..., d, d)
+    :return: np.array(..., d, d)
+    """
+    return _matrix_sqrt_and_eigenvalues(rho, tol)[0]
+
+
+def is_pure(rho, tol=FIDELITY_TOLERANCE):
+    """
+    Check that density matrices are pure states by Tr(rho) = 1 and Tr(rho^2) = 1 in O(d^2).
+    rho must be hermitian and positive semidefinite: Tr(rho^2) = Tr(rho)^2 = 1 holds
+    for some matrices with negative eigenvalues, they are reported as pure.
+    :param rho: np.array(..., d, d), positive semidefinite
+    :return: np.array(...) of bool
+    """
+    rho = np.asarray(rho)
+    trace = np.real(np.trace(rho, axis1=-2, axis2=-1))
+    purity = np.sum(np.abs(rho)**2, axis=(-2, -1))  # Tr(rho^2) for hermitian rho
+    return (np.abs(trace - 1) <= tol) & (np.abs(purity - 1) <= tol)
+
+
+def fidelities(rho1, rho2, tol=FIDELITY_TOLERANCE):
+    """
+    F = (Tr sqrt(sqrt(rho1) rho2 sqrt(rho1)))^2 for stacks of pairs of density matrices.
+    If one of matrices is pure, F = Tr(rho1 rho2) is calculated in O(d^2) per pair.
+    Purity of rho2 is checked by is_pure() in O(d^2), so rho2 must be positive semidefinite.
+    Purity of rho1 is taken from eigenvalues of its square root, which is calculated once
+    per reference matrix (e.g. for one theory matrix and a stack of experimental ones)
+    and only if some of rho2 are mixed. For mixed pairs F is calculated by eigenvalues
+    of the hermitian matrix sqrt(rho1) rho2 sqrt(rho1).
+    Eigenvalues smaller than tol are treated as zero, so the result is accurate
+    up to ~sqrt(tol) for nearly singular matrices and up to rounding errors otherwise.
+    :param rho1: np.array(..., d, d), reference matrices
+    :param rho2: np.array(..., d, d), positive semidefinite, shapes of rho1 and rho2
+    are broadcasted
+    :return: np.array(...) of float, or float for two matrices
+    """
+    rho1, rho2 = np.asarray(rho1), np.asarray(rho2)
+    shape = np.broadcast(rho1, rho2).shape
+
+    result = np.real(np.einsum('...ij,...ji->...', rho1, rho2))
+    result = np.array(np.broadcast_to(result, shape[:-2]))
+    mixed = ~np.broadcast_to(is_pure(rho2, tol), shape[:-2])
+    if mixed.any():
+        sqrt_rho1, eigenvalues = _matrix_sqrt_and_eigenvalues(rho1, tol)
+        pure1 = (np.abs(eigenvalues[..., -1] - 1) <= tol) & \
+            np.all(np.abs(eigenvalues[..., :-1]) <= tol, axis=-1)
+        mixed = mixed & ~np.broadcast_to(pure1, shape[:-2])
+    if mixed.any():
+        sqrt_rho1 = np.broadcast_to(sqrt_rho1, shape)[mixed]
+        product = sqrt_rho1 @ np.broadcast_to(rho2, shape)[mixed] @ sqrt_rho1
+        eigenvalues = np.linalg.eigvalsh(product)
+        result[mixed] = np.sum(np.sqrt(np.where(eigenvalues > tol, eigenvalues, 0)), axis=-1)**2
+    return result if result.ndim else float(result)
 
 
 def fidelity(rho1, rho2):
     """
     R. Jozsa, Fidelity for mixed quantum states. J. Modern Opt. 41, 2315–2323 (1994)
     https://arxiv.org/pdf/quant-ph/0408063.pdf
+    See fidelities() for stacks of matrices.
     >>> rho = get_density_matrix_from_state(get_state(1, dim=2))
     >>> fidelity(rho, rho) > 0.999
     True
     """
-    return np.trace(sqrtm(
-        sqrtm(rho1)@rho2@sqrtm(rho1)
-    ))**2
+    return fidelities(rho1, rho2)
+
+
+def batched_channel(channel):
+    """
+    Mark channel that can be applied to a stack of matrices np.array(N, dim, dim) at once
+    (e.g. it uses only @, swapaxes and traces over the last axes).
+    create_choi_matrix_from_channel() calls such channel once.
+    :param channel: function
+    :return: the same function
+    """
+    channel.batched = True
+    return channel
 
 
 def create_choi_matrix_from_channel(channel, dim=DIM):
     """
     Building choi matrix C = (Id * Channel) (|psi+><psi+|)
     https://journals.aps.org/pra/abstract/10.1103/PhysRevA.87.022310
-    :param channel: function
+    :param channel: function. If it's marked by batched_channel, all matrix units
+    are transformed by one call
     >>> identity_channel = lambda rho: rho
     >>> np.array_equal(
     ...     create_choi_matrix_from_channel(identity_channel, dim=2),
@@ -74,6 +174,12 @@ def create_choi_matrix_from_channel(channel, dim=DIM):
     ... )
     True
     """
+    if getattr(channel, 'batched', False):
+        # units[dim*i + j] = |i><j|
+        units = np.eye(dim**2, dtype=complex).reshape(dim**2, dim, dim)
+        outputs = np.asarray(channel(units)).reshape(dim, dim, dim, dim)
+        return outputs.transpose(0, 2, 1, 3).reshape(dim**2, dim**2)/dim
+
     blocks = [[None for i in range(dim)] for j in range(dim)]
     for i in range(dim):
         for j in range(dim):
@@ -83,75 +189,158 @@ def create_choi_matrix_from_channel(channel, dim=DIM):
     return np.block(blocks)/dim
 
 
-def get_kraus_operators_from_choi(choi):
+@lru_cache(maxsize=32)
+def _get_theory_choi_matrix(channel_class, dim, parameters):
+    return create_choi_matrix_from_channel(channel_class.get_theory_channel(**dict(parameters)),
+                                           dim=dim)
+
+
+def get_theory_choi_matrix(channel_class, dim=DIM, **parameters):
+    """
+    Choi matrix of the theory channel of channel_class, it's calculated once per class, dim
+    and values of parameters
+    :param channel_class: subclass of AbstractChannelCircuit
+    :param parameters: numbers, arguments of get_theory_channel() for parameterized channels
+    :return: np.array(dim**2, dim**2), a copy of the cached matrix
+    """
+    return np.copy(_get_theory_choi_matrix(channel_class, dim, tuple(sorted(parameters.items()))))
+
+
+def get_kraus_operators_from_choi(choi, tol=10**(-3)):
     """
     https://quantumcomputing.stackexchange.com/questions/5804/vectorization-map-to-dynamical-map
 
-    :param choi:
-    :return:
+    Kraus operators are eigenvectors of the Choi matrix scaled by square roots of eigenvalues.
+    Operators are sorted by eigenvalues (descending), the global phase of every operator
+    is chosen to make it hermitian if it's possible and the first significant element
+    positive otherwise.
+    :param choi: np.array(d**2, d**2) or a stack of them np.array(N, d**2, d**2)
+    :param tol: eigenvalues smaller than tol*(max eigenvalue) are skipped
+    :return: list of np.array(d, d) for one matrix, np.array(N, r, d, d) for a stack
+    (r is the maximal number of operators, the rest operators are zeros)
     """
-    dim = int(np.sqrt(choi.shape[0]))
+    choi = np.asarray(choi)
+    if int(np.sqrt(choi.shape[-1])) != np.sqrt(choi.shape[-1]):
+        raise TypeError('The Choi matrix must have dimension that equal to n**2 x n**2')
+    dim = int(np.sqrt(choi.shape[-1]))
+    batch = choi.reshape(-1, dim**2, dim**2)
 
     # TODO Workaround
-    if np.abs(np.trace(choi) - 1) < 10**(-2):
-        choi *= dim
+    trace = np.trace(batch, axis1=-2, axis2=-1)
+    batch = np.where((np.abs(trace - 1) < 10**(-2))[:, None, None], batch*dim, batch)
 
-    eigenvalues, eigenvects = np.linalg.eig(choi)
-    if (np.imag(eigenvalues) > 10**(-3)*np.max(np.abs(eigenvalues))).any():
+    max_elements = np.max(np.abs(batch), axis=(-2, -1), keepdims=True)
+    if (np.abs(batch - np.conj(np.swapaxes(batch, -1, -2))) > tol*max_elements).any():
         raise Exception('The Choi matrix has to be hermitian')
-    eigenvalues = np.real(eigenvalues)
 
-    for i, a in enumerate(eigenvects.T):
-        for j, b in enumerate(eigenvects.T):
-            if np.abs(np.conj(a.T)@b - (1 if i == j else 0)) > 10**(-3):
-                raise NotImplementedError('Numpy returned non-orthogonal vectors')
+    eigenvalues, eigenvectors = np.linalg.eigh(batch)
+    identity = np.eye(dim**2)
+    if (np.abs(np.conj(np.swapaxes(eigenvectors, -1, -2))@eigenvectors - identity) > tol).any():
+        raise NotImplementedError('Numpy returned non-orthogonal vectors')
+
+    # eigenvectors[n, d*i + a, k] = K_k[a, i]
+    operators = np.sqrt(eigenvalues.astype(complex))[:, :, None, None] * \
+        np.swapaxes(eigenvectors, -1, -2).reshape(-1, dim**2, dim, dim).swapaxes(-1, -2)
+
+    max_abs_eigenvalues = np.max(np.abs(eigenvalues), axis=-1, keepdims=True)
+    significant = np.abs(eigenvalues) >= tol*max_abs_eigenvalues
+    operators = _normalize_kraus_phases(operators, tol)
+
+    # Sort by eigenvalues, operators with equal eigenvalues are sorted by the first
+    # significant element
+    flat = np.abs(operators.reshape(*operators.shape[:2], -1)) > tol
+    first_elements = np.where(flat.any(axis=-1), np.argmax(flat, axis=-1), dim**2)
+    order = np.lexsort((first_elements, -np.round(eigenvalues/max_abs_eigenvalues, 6),
+                        ~significant), axis=-1)
+    operators = np.take_along_axis(operators, order[:, :, None, None], axis=1)
+    operators = operators * np.take_along_axis(significant, order, axis=1)[:, :, None, None]
+
+    rank = max(np.max(np.sum(significant, axis=-1)), 1)
+    operators = operators[:, :rank]
+    if choi.ndim == 2:
+        kraus_operators = [operator for operator in operators[0] if (np.abs(operator) > 0).any()]
+        return kraus_operators if len(kraus_operators) > 0 else [np.eye(dim)]
+    return operators.reshape(*choi.shape[:-2], rank, dim, dim)
+
+
+def _normalize_kraus_phases(operators, tol):
+    """
+    Multiply operators by global phases. Operators equal to e^{i phi} H (H is hermitian),
+    i.e. |Tr(K^2)| = Tr(K^+ K), become hermitian with the first significant element
+    that has positive real part (or imaginary part if the real one is zero).
+    The rest operators are rotated to make the first significant element real positive.
+    :param operators: np.array(..., d, d)
+    :return: np.array(..., d, d)
+    """
+    squared_traces = np.einsum('...ij,...ji->...', operators, operators)
+    norms = np.sum(np.abs(operators)**2, axis=(-2, -1))
+    hermitian_like = (np.abs(squared_traces) >= (1 - tol)*norms) & (norms > 0)
+    # Tr((e^{-i phi} K)^2) = |Tr(K^2)|, the phase is defined up to a sign
+    phases = np.sqrt(np.conj(squared_traces)/np.where(hermitian_like, np.abs(squared_traces), 1))
+    operators = operators * np.where(hermitian_like, phases, 1)[..., None, None]
+
+    flat = operators.reshape(*operators.shape[:-2], -1)
+    first_indexes = np.argmax(np.abs(flat) > tol*np.sqrt(norms)[..., None], axis=-1)
+    first = np.take_along_axis(flat, first_indexes[..., None], axis=-1)[..., 0]
+    significant_real = np.abs(np.real(first)) > tol*np.abs(first)
+    signs = np.where(np.where(significant_real, np.real(first), np.imag(first)) < 0, -1, 1)
+    first_phases = np.conj(first)/np.where(first != 0, np.abs(first), 1)
+    phases = np.where(hermitian_like, signs, np.where(first != 0, first_phases, 1))
+    return operators * phases[..., None, None]
+
+
+def partial_trace(rho, dims, trace_out):
+    """
+    Partial trace of rho = kron(rho_0, rho_1, ...) over subsystems trace_out
+    :param rho: np.array(..., D, D), density matrix or stack of them
+    :param dims: list of dimensions of subsystems, prod(dims) = D
+    :param trace_out: list of indexes of subsystems that are traced out
+    :return: np.array(..., D', D'), D' is product of dimensions of the rest subsystems
+    >>> a, b = np.diag([0.25, 0.75]), np.eye(3)/3
+    >>> np.allclose(partial_trace(np.kron(a, b), [2, 3], [1]), a)
+    True
+    >>> partial_trace(np.array([np.kron(a, b)]*5), [2, 3], [0]).shape
+    (5, 3, 3)
+    """
+    dims = list(dims)
+    n = len(dims)
+    batch_shape = rho.shape[:-2]
+    rho = rho.reshape(*batch_shape, *dims, *dims)
 
-    kraus_operators = []
-    if int(np.sqrt(choi.shape[0])) != np.sqrt(choi.shape[0]):
-        raise TypeError('The Choi matrix must have dimension that equal to n**2 x n**2')
+    row_indexes = list(range(n))
+    column_indexes = [i if i in trace_out else n + i for i in range(n)]
+    kept = [i for i in range(n) if i not in trace_out]
+    output_indexes = kept + [n + i for i in kept]
 
-    max_abs_eigenvalue = np.max(np.abs(eigenvalues))
-    for i, value in enumerate(eigenvalues):
-        if np.abs(value) < 10**(-3)*max_abs_eigenvalue:
-            continue
-
-        matrix = sqrt(value)*eigenvects.T[i].reshape((dim, dim))
-        if not np.allclose(matrix, np.conj(matrix.T), atol=1e-3):
-            # Try to make hermitian
-            exit = False
-            for i in range(matrix.shape[0]):
-                if exit:
-                    break
-
-                for j in range(i + 1, matrix.shape[0]):
-                    if (np.abs(matrix[i, j]) < 1e-3 < np.abs(matrix[j, i])) or \
-                            (np.abs(matrix[i, j]) > 1e-3 > np.abs(matrix[j, i])):
-                        exit = True; break
-                    elif np.abs(matrix[i, j]) < 1e-3 and np.abs(matrix[j, i]) < 1e-3:
-                        continue
-                    else:
-                        matrix *= -sqrt(np.conj(matrix[j, i])/matrix[i, j])
-                        exit = True; break
-
-        kraus_operators.append(matrix)
-    return kraus_operators if len(kraus_operators) > 0 else [np.eye(dim)]
+    result = np.einsum(rho, [Ellipsis, *row_indexes, *column_indexes], [Ellipsis, *output_indexes])
+    kept_dim = int(np.prod([dims[i] for i in kept]))
+    return result.reshape(*batch_shape, kept_dim, kept_dim)
 
 
 def partial_trace_with_halves(Rho, half):
-    if np.sqrt(Rho.shape[0]) != int(np.sqrt(Rho.shape[0])):
+    """
+    :param Rho: matrix n**2 x n**2 (np.array, also stack of them, or sympy Matrix)
+    :param half: 1 to keep the first half (trace out the second one), 2 to keep the second half
+    """
+    if np.sqrt(Rho.shape[-1]) != int(np.sqrt(Rho.shape[-1])):
         raise TypeError('Density matrix must have dimension that equal to n**2 x n**2')
 
-    channel_dim = int(np.sqrt(Rho.shape[0]))
+    channel_dim = int(np.sqrt(Rho.shape[-1]))
 
-    from sympy import MatrixBase
     if isinstance(Rho, (np.ndarray, np.generic)):
-        output_rho = np.zeros((channel_dim, channel_dim), dtype=complex)
-    elif isinstance(Rho, MatrixBase):
-        from sympy import zeros
-        output_rho = zeros(channel_dim)
-    else:
+        return partial_trace(Rho, [channel_dim, channel_dim], [2 - half])
+    return _partial_trace_with_halves_sympy(Rho, half, channel_dim)
+
+
+def _partial_trace_with_halves_sympy(Rho, half, channel_dim):
+    """
+    Slow elementwise version of partial_trace_with_halves() for sympy matrices
+    """
+    from sympy import MatrixBase, zeros
+    if not isinstance(Rho, MatrixBase):
         raise TypeError('Unknown type of Rho')
 
+    output_rho = zeros(channel_dim)
     if half == 1:
         for i in range(channel_dim):
             for j in range(channel_dim):
@@ -166,20 +355,47 @@ def partial_trace_with_halves(Rho, half):
 
 
 def create_channel_from_choi_matrix(choi):
+    """
+    The channel is applied as a superoperator S: vec(Channel(rho)) = S@vec(rho),
+    vec is row-major. S is calculated once and it's available as channel.superoperator
+    :param choi: np.array(dim**2, dim**2), see create_choi_matrix_from_channel()
+    :return: function, it can be applied to a stack of matrices
+    """
     if np.sqrt(choi.shape[0]) != int(np.sqrt(choi.shape[0])):
         raise TypeError('Choi matrix must have dimension that equal to n**2 x n**2')
 
     channel_dim = int(np.sqrt(choi.shape[0]))
 
+    # Channel(rho)[a, b] = dim * sum_ij rho[i, j] choi[dim*i + a, dim*j + b]
+    superoperator = channel_dim*np.asarray(choi).reshape((channel_dim,)*4).transpose(1, 3, 0, 2)
+    return create_channel_from_superoperator(
+        superoperator.reshape(channel_dim**2, channel_dim**2)
+    )
+
+
+def create_channel_from_superoperator(superoperator):
+    """
+    :param superoperator: np.array(dim**2, dim**2), vec(Channel(rho)) = S@vec(rho),
+    vec is row-major
+    :return: function, it can be applied to a stack of matrices,
+    the superoperator is available as channel.superoperator
+    """
     def _channel(rho):
-        mat = channel_dim*np.kron(rho.transpose(), np.eye(channel_dim, dtype=complex))@choi
-        return partial_trace_with_halves(mat, 2)
-    return _channel
+        """
+        :param rho: np.array(..., dim, dim), density matrix or stack of them
+        """
+        rho = np.asarray(rho)
+        return (rho.reshape(*rho.shape[:-2], -1)@superoperator.T).reshape(rho.shape)
+    _channel.superoperator = superoperator
+    return batched_channel(_channel)
 
 
 def get_matrix_from_tomography_to_eij(matrices=None):
     """
-    Transformation matrix from matrices to eij(eij = |i><j|)
+    Transformation matrix from matrices to eij(eij = |i><j|): eij = sum_k T[dim*i + j, k] matrices[k].
+    It's calculated once per basis.
+    :param matrices: dim**2 matrices dim x dim (default: get_qutrit_density_matrix_basis())
+    :return: np.array(dim**2, dim**2)
     >>> sigma0, sigmaz = np.eye(2), np.diag([1, -1])
     >>> sigmax, sigmay = np.array([[0, 1], [1, 0]]), np.array([[0, -1j], [1j, 0]])
     >>> np.array_equal(
@@ -194,15 +410,35 @@ def get_matrix_from_tomography_to_eij(matrices=None):
     True
     """
     if matrices is None:
-        matrices = get_qutrit_density_matrix_basis()
+        matrices = _get_density_matrix_basis(DIM)
+    matrices = np.asarray(matrices, dtype=complex)
+    return np.array(_get_matrix_from_tomography_to_eij(matrices.tobytes(), matrices.shape))
+
+
+@lru_cache(maxsize=32)
+def _get_matrix_from_tomography_to_eij(matrices_bytes, shape):
+    matrices = np.frombuffer(matrices_bytes, dtype=complex).reshape(shape)
+    dim = shape[-1]
+    # matrices[k] = sum_ij matrices[k][i, j] eij, so T is the inverse of it
+    transformation = np.linalg.solve(matrices.reshape(dim**2, dim**2), np.eye(dim**2))
+    transformation.flags.writeable = False
+    return transformation
+
+
+def create_choi_matrix_from_tomography(matrices, basis=None):
+    """
+    Choi matrix (see create_choi_matrix_from_channel()) from results of the channel
+    applied to basis matrices
+    :param matrices: np.array(dim**2, d, d), Channel(basis[k])
+    :param basis: dim**2 matrices dim x dim (default: get_qutrit_density_matrix_basis())
+    :return: np.array(dim*d, dim*d)
+    """
+    transformation = get_matrix_from_tomography_to_eij(basis)
+    matrices = np.asarray(matrices)
+    dim, output_dim = int(np.sqrt(transformation.shape[0])), matrices.shape[-1]
+    choi = np.einsum('ijk,kab->iajb', transformation.reshape(dim, dim, -1), matrices)
+    return choi.reshape(dim*output_dim, dim*output_dim)/dim
 
-    dim = matrices[0].shape[0]
-    ER = np.zeros((dim**2, dim**2), dtype=complex)
-    for k, matrix in enumerate(matrices):
-        for i in range(dim):
-            for j in range(dim):
-                ER[dim * i + j, k] = matrix[i, j]
-    return np.transpose(np.linalg.inv(ER))
 
 if __name__ == '__main__':
     from importlib import import_module
@@ -215,7 +451,8 @@ if __name__ == '__main__':
     for class_name in channel_class_names:
         channelClass = getattr(import_module('qchannels.channels'), class_name)
         try:
-            choi = create_choi_matrix_from_channel(channelClass.get_theory_channel())
+            choi = create_choi_matrix_from_channel(channelClass.get_theory_channel(),
+                                                   dim=channelClass.THEORY_DIM or DIM)
         except NotImplementedError:
             pass
         assert(0.999 < fidelity(choi, choi) < 1.001)
@@ -0,0 +1,45 @@
+from functools import lru_cache
+
+from qiskit import QuantumCircuit
+from qiskit.ignis.verification.tomography import state_tomography_circuits
+
+
+@lru_cache(maxsize=128)
+def get_tomography_suffixes(qr, meas_qubits):
+    """
+    Measurement parts (basis changes and measurements) of state tomography circuits.
+    They're built once per register and meas_qubits.
+    :param qr: QuantumRegister
+    :param meas_qubits: tuple of qubits of qr
+    :return: list of QuantumCircuit, named as state_tomography_circuits does
+    """
+    return state_tomography_circuits(QuantumCircuit(qr), [qr[qubit] for qubit in meas_qubits])
+
+
+def concatenate_circuits(prefix, suffix, name=None):
+    """
+    prefix + suffix without copying of instructions and checks of registers.
+    All registers of suffix have to be in prefix. Parameters can be only in prefix.
+    :return: QuantumCircuit
+    """
+    circuit = QuantumCircuit(*prefix.qregs, *prefix.cregs, name=name)
+    circuit.data = prefix.data + suffix.data
+    for parameter, instructions in prefix._parameter_table.items():
+        circuit._parameter_table[parameter] = list(instructions)
+    return circuit
+
+
+def tomography_circuits(circuit, meas_qubits):
+    """
+    The same circuits as state_tomography_circuits(circuit, meas_qubits of the first register)
+    returns, but measurement parts are taken from the cache.
+    :param circuit: QuantumCircuit
+    :param meas_qubits: list of qubits of the first register of circuit
+    :return: list of QuantumCircuit
+    """
+    suffixes = get_tomography_suffixes(circuit.qregs[0], tuple(meas_qubits))
+
+    # The order of registers is the same as in state_tomography_circuits
+    prefix = QuantumCircuit(*suffixes[0].qregs, *suffixes[0].cregs)
+    prefix.extend(circuit)
+    return [concatenate_circuits(prefix, suffix, name=suffix.name) for suffix in suffixes]
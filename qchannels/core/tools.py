@@ -1,22 +1,160 @@
-import numpy as np
-from qiskit import BasicAer
-import sys
-
-np.set_printoptions(threshold=sys.maxsize)
+import hashlib
+from functools import lru_cache
+from importlib import import_module
+from itertools import islice
 
 IBMQ_SIMULATOR = 'ibmq_qasm_simulator'
 LOCAL_SIMULATOR = 'qasm_simulator'
 SIMULATORS = [IBMQ_SIMULATOR, LOCAL_SIMULATOR]
+LOCAL_BACKENDS = [LOCAL_SIMULATOR, 'statevector_simulator', 'unitary_simulator']  # BasicAer
 MAX_JOBS_PER_ONE = 70
-BACKENDS = BasicAer.backends()  # In set_parameters() BACKENDS will be supplemented IBMQ.backends()
+
+# Kinds of results, see ResultStore
+RHO = 'rho'
+CHOI = 'choi'
+COUNTS = 'counts'
+
+# Name of channel -> (module, class). Channels are imported only when they're used
+CHANNELS = {
+    'Bit-Flip': ('qchannels.channels.bit_flip', 'BitFlipCircuit'),
+    'Identity': ('qchannels.channels.identity', 'IdentityCircuit'),
+    'Landau-Streater': ('qchannels.channels.landau_streater', 'LandauStreaterCircuit'),
+    'Qutrit-Superposition': ('qchannels.channels.qutrit_superposition',
+                             'QutritSuperpositionCircuit'),
+    'Werner-Holevo': ('qchannels.channels.werner_holevo', 'WernerHolevoCircuit'),
+}
+
+_BACKENDS = {}  # name -> backend, BasicAer backends are loaded on the first call of get_backends()
+
+
+def get_channel_class(name):
+    """
+    :param name: str, key of CHANNELS
+    :return: subclass of AbstractChannelCircuit
+    """
+    module_name, class_name = CHANNELS[name]
+    return getattr(import_module(module_name), class_name)
+
+
+def get_backends():
+    """
+    :return: list of backends: BasicAer backends and remote ones if add_backends() was called
+    """
+    return list(_get_backends_registry().values())
+
+
+def _get_backends_registry():
+    if not _BACKENDS:
+        from qiskit import BasicAer
+        _BACKENDS.update((backend.name(), backend) for backend in BasicAer.backends())
+    return _BACKENDS
+
+
+def add_backends(backends):
+    """
+    In set_parameters() backends of IBMQ provider are added
+    """
+    registry = _get_backends_registry()
+    for backend in backends:
+        registry[backend.name()] = backend
+    get_backend_coupling_graph.cache_clear()
+
+
+def get_backend(name):
+    """
+    :raise: ValueError if there isn't backend with the name
+    """
+    try:
+        return _get_backends_registry()[name]
+    except KeyError:
+        raise ValueError(f"Unknown backend {name}") from None
+
+
+class CouplingGraph:
+    """
+    Index of a coupling map: a set of directed edges and adjacency lists,
+    so checks of edges are O(1)
+    """
+    def __init__(self, coupling_map):
+        """
+        :param coupling_map: list of [control, target]
+        """
+        self.edges = frozenset((control, target) for control, target in coupling_map)
+        self.adjacency = {}
+        for control, target in self.edges:
+            self.adjacency.setdefault(control, set()).add(target)
+
+    def has_edge(self, control, target):
+        return (control, target) in self.edges
+
+    def neighbors(self, qubit):
+        """
+        :return: set of targets of CNOT with the control qubit
+        """
+        return self.adjacency.get(qubit, set())
+
+
+def get_coupling_graph(coupling_map):
+    """
+    :param coupling_map: list of [control, target] or None (all-to-all)
+    :return: CouplingGraph or None
+    """
+    if coupling_map is None:
+        return None
+    return _get_coupling_graph(tuple(map(tuple, coupling_map)))
+
+
+@lru_cache(maxsize=None)
+def _get_coupling_graph(coupling_map):
+    return CouplingGraph(coupling_map)
+
+
+@lru_cache(maxsize=None)
+def get_backend_coupling_graph(name):
+    """
+    :return: CouplingGraph of the backend or None if all qubits are connected
+    """
+    configuration = get_backend(name).configuration()
+    return get_coupling_graph(getattr(configuration, 'coupling_map', None))
 
 
 def chunks(l, n):
-    """Yield successive n-sized chunks from l."""
-    for i in range(0, len(l), n):
-        yield l[i:i + n]
+    """Yield successive n-sized chunks from l. l can be any iterable, e.g. generator."""
+    iterator = iter(l)
+    chunk = list(islice(iterator, n))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, n))
 
 
 def destroy_circuits(qp):
     for circuit_name in qp.get_circuit_names():
         qp.destroy_circuit(circuit_name)
+
+
+def circuit_hash(circuit):
+    """
+    Canonical hash of circuit. It depends only on sizes of registers and instructions,
+    names of the circuit and its registers are ignored (they are generated automatically
+    and differ from run to run).
+    :param circuit: QuantumCircuit
+    :return: str, hex digest
+    """
+    offsets = {}
+    for regs in [circuit.qregs, circuit.cregs]:
+        offset = 0
+        for reg in regs:
+            offsets[reg] = offset
+            offset += reg.size
+
+    description = [[reg.size for reg in circuit.qregs], [reg.size for reg in circuit.cregs]]
+    for instruction, qargs, cargs in circuit.data:
+        control = instruction.control
+        description.append([
+            instruction.name,
+            [str(param) for param in instruction.params],
+            [offsets[reg] + index for reg, index in qargs],
+            [offsets[reg] + index for reg, index in cargs],
+            None if control is None else [[offsets[control[0]], control[0].size], str(control[1])]
+        ])
+    return hashlib.sha256(repr(description).encode()).hexdigest()